@@ -9,9 +9,35 @@ Supports multiple data sources:
 
 import json
 import os
+import re
 from pathlib import Path
-from typing import Optional, Dict, List
-from difflib import SequenceMatcher
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+
+try:
+    import orjson
+except ImportError:  # Optional speedup — stdlib json is used as a fallback
+    orjson = None
+
+# token_set_ratio ignores token order and extra tokens ("GSK Voltaren Arthritis
+# Pain Gel 100g" vs "Voltaren Arthritis Pain Gel"), so its scores run higher than
+# a plain edit-distance ratio — thresholds below are tuned for it.
+_SCORER = fuzz.token_set_ratio
+# That same leniency gives a perfect score to any name whose words are a subset
+# of another's ("Salonpas Arthritis Pain Patch" vs "Salonpas Pain Relief Patch"
+# scores 0.84), so a name match with no brand match behind it must also clear
+# _NAME_ONLY_CUTOFF on token_sort_ratio, which ignores order but not extra words.
+_STRICT_SCORER = fuzz.token_sort_ratio
+_NAME_ONLY_CUTOFF = 0.8
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def _normalize(s: str) -> str:
+    """Lowercase and drop punctuation/whitespace for exact duplicate checks"""
+    return _NON_ALNUM.sub("", s.lower())
 
 
 class AffiliateProductManager:
@@ -24,36 +50,68 @@ class AffiliateProductManager:
         """
         self.affiliate_data_path = affiliate_data_path
         self.affiliate_data = self._load_affiliate_data()
+        self._build_index()
     
     def _load_affiliate_data(self) -> Dict:
         """Load affiliate products data from JSON file"""
         try:
-            if os.path.exists(self.affiliate_data_path):
-                with open(self.affiliate_data_path, 'r') as f:
-                    return json.load(f)
-            else:
-                # Return empty structure if file doesn't exist
-                return {
-                    "products": [],
-                    "matching_rules": {
-                        "match_by": ["product_name", "brand"],
-                        "fuzzy_match": True,
-                        "case_sensitive": False
-                    }
+            if orjson is not None:
+                with open(self.affiliate_data_path, 'rb') as f:
+                    return orjson.loads(f.read())
+            with open(self.affiliate_data_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # Return empty structure if file doesn't exist
+            return {
+                "products": [],
+                "matching_rules": {
+                    "match_by": ["product_name", "brand"],
+                    "fuzzy_match": True,
+                    "case_sensitive": False
                 }
+            }
         except Exception as e:
             print(f"⚠️  Warning: Could not load affiliate data: {e}")
             return {"products": [], "matching_rules": {}}
     
-    def _fuzzy_match(self, str1: str, str2: str) -> float:
-        """Calculate similarity ratio between two strings"""
-        return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+    def _build_index(self) -> None:
+        """Precompute lowercased and RapidFuzz-processed names/brands once per load"""
+        products = self.affiliate_data.get("products", [])
+        names = [p.get("product_name") or "" for p in products]
+        brands = [p.get("brand") or "" for p in products]
+        self._names_lc = [n.lower() for n in names]
+        self._brands_lc = [b.lower() for b in brands]
+        self._names_proc = [utils.default_process(n) for n in names]
+        self._brands_proc = [utils.default_process(b) for b in brands]
+        # Numeric masks for the batch scorer, built once instead of per call
+        self._has_name = np.fromiter((bool(n) for n in names), dtype=bool, count=len(names))
+        self._has_brand = np.fromiter((bool(b) for b in brands), dtype=bool, count=len(brands))
+        # First product wins on duplicate names, same as the scoring loop
+        self._exact_index: Dict[str, int] = {}
+        for idx, name_lc in enumerate(self._names_lc):
+            if name_lc:
+                self._exact_index.setdefault(name_lc, idx)
+        self._name_set = {_normalize(n) for n in names if n}
+    
+    def _extract_scores(self, query: str, choices: List[str], threshold: float) -> Dict[int, float]:
+        """Map choice index -> 0-1 similarity for every choice at or above threshold"""
+        return {
+            idx: score / 100.0
+            for _, score, idx in process.extract(
+                query,
+                choices,
+                scorer=_SCORER,
+                processor=None,
+                score_cutoff=threshold * 100,
+                limit=None,
+            )
+        }
     
     def find_affiliate_link(
         self, 
         product_name: str, 
         brand: Optional[str] = None,
-        threshold: float = 0.8
+        threshold: float = 0.7
     ) -> Optional[Dict]:
         """
         Find affiliate link for a product by matching product name and/or brand
@@ -74,43 +132,89 @@ class AffiliateProductManager:
         fuzzy_match = matching_rules.get("fuzzy_match", True)
         case_sensitive = matching_rules.get("case_sensitive", False)
         
+        query_lc = product_name.lower()
+        query_proc = utils.default_process(product_name)
+        brand_lc = brand.lower() if brand else ""
+        brand_proc = utils.default_process(brand) if brand else ""
+        
+        # Exact (case-insensitive) name hit scores 1.0, the best any product can
+        # get when no brand score is blended in — return it without scanning
+        if (
+            "product_name" in match_by
+            and not ("brand" in match_by and brand)
+            and (fuzzy_match or not case_sensitive)
+        ):
+            hit = self._exact_index.get(query_lc)
+            if hit is not None:
+                return self._format_match(self.affiliate_data["products"][hit], 1.0)
+        
         best_match = None
         best_score = 0.0
+        products = self.affiliate_data["products"]
+        
+        # Score every product name/brand in one native call per field; pairs
+        # below the threshold are pruned inside RapidFuzz via score_cutoff
+        name_scores = {}
+        brand_scores = {}
+        if fuzzy_match:
+            if "product_name" in match_by:
+                name_scores = self._extract_scores(query_proc, self._names_proc, threshold)
+            if "brand" in match_by and brand:
+                brand_scores = self._extract_scores(brand_proc, self._brands_proc, threshold)
+            # Only products that cleared the cutoff on some field can score
+            candidates = sorted(name_scores.keys() | brand_scores.keys())
+        else:
+            candidates = range(len(products))
         
-        for product in self.affiliate_data["products"]:
+        for idx in candidates:
+            product = products[idx]
             score = 0.0
             matches = 0
+            name_hit = brand_hit = False
             
             # Match by product name
             if "product_name" in match_by and product.get("product_name"):
                 if fuzzy_match:
-                    similarity = self._fuzzy_match(
-                        product_name, 
-                        product["product_name"]
-                    )
+                    similarity = name_scores.get(idx, 0.0)
                     if similarity >= threshold:
                         score += similarity
                         matches += 1
+                        name_hit = True
                 else:
-                    name1 = product_name if case_sensitive else product_name.lower()
-                    name2 = product["product_name"] if case_sensitive else product["product_name"].lower()
-                    if name1 == name2:
+                    if case_sensitive:
+                        is_match = product_name == product["product_name"]
+                    else:
+                        is_match = query_lc == self._names_lc[idx]
+                    if is_match:
                         score += 1.0
                         matches += 1
             
-            # Match by brand
+            # Match by brand — when both sides name one, a brand that doesn't
+            # match rules the product out rather than just not adding to its score
             if "brand" in match_by and brand and product.get("brand"):
                 if fuzzy_match:
-                    similarity = self._fuzzy_match(brand, product["brand"])
-                    if similarity >= threshold:
-                        score += similarity * 0.5  # Brand is less important
-                        matches += 1
+                    similarity = brand_scores.get(idx, 0.0)
+                    if similarity < threshold:
+                        continue
+                    score += similarity * 0.5  # Brand is less important
+                    matches += 1
+                    brand_hit = True
                 else:
-                    brand1 = brand if case_sensitive else brand.lower()
-                    brand2 = product["brand"] if case_sensitive else product["brand"].lower()
-                    if brand1 == brand2:
-                        score += 0.5
-                        matches += 1
+                    if case_sensitive:
+                        is_match = brand == product["brand"]
+                    else:
+                        is_match = brand_lc == self._brands_lc[idx]
+                    if not is_match:
+                        continue
+                    score += 0.5
+                    matches += 1
+            
+            if (
+                name_hit
+                and not brand_hit
+                and _STRICT_SCORER(query_proc, self._names_proc[idx]) < _NAME_ONLY_CUTOFF * 100
+            ):
+                continue
             
             # Normalize score
             if matches > 0:
@@ -118,18 +222,127 @@ class AffiliateProductManager:
                 if normalized_score > best_score:
                     best_score = normalized_score
                     best_match = product
+                    if best_score >= 1.0:
+                        break  # Nothing can beat a perfect score
         
         if best_match and best_score >= threshold:
-            return {
-                "affiliate_link": best_match.get("affiliate_link"),
-                "affiliate_network": best_match.get("affiliate_network"),
-                "match_score": best_score,
-                "metadata": {k: v for k, v in best_match.items() 
-                           if k not in ["affiliate_link", "affiliate_network"]}
-            }
+            return self._format_match(best_match, best_score)
         
         return None
     
+    def find_affiliate_links_batch(
+        self,
+        queries: List[Tuple[str, Optional[str]]],
+        threshold: float = 0.7
+    ) -> List[Optional[Dict]]:
+        """
+        Find affiliate links for many products at once
+        
+        Scores every query against every product with a single
+        rapidfuzz.process.cdist call per field instead of one Python loop
+        per query. Results match calling find_affiliate_link per query.
+        
+        Args:
+            queries: List of (product_name, brand) tuples; brand may be None
+            threshold: Similarity threshold for fuzzy matching (0-1)
+        
+        Returns:
+            List with one find_affiliate_link-style result (or None) per query
+        """
+        products = self.affiliate_data.get("products")
+        if not queries:
+            return []
+        if not products:
+            return [None] * len(queries)
+        
+        matching_rules = self.affiliate_data.get("matching_rules", {})
+        match_by = matching_rules.get("match_by", ["product_name"])
+        if not matching_rules.get("fuzzy_match", True):
+            return [self.find_affiliate_link(name, brand, threshold) for name, brand in queries]
+        
+        shape = (len(queries), len(products))
+        score = np.zeros(shape)
+        matches = np.zeros(shape)
+        
+        names_proc = [utils.default_process(name) for name, _ in queries]
+        name_ok = brand_ok = np.zeros(shape, dtype=bool)
+        if "product_name" in match_by:
+            name_sim = process.cdist(
+                names_proc,
+                self._names_proc,
+                scorer=_SCORER,
+                processor=None,
+                score_cutoff=threshold * 100,
+                dtype=np.float64,
+                workers=-1,
+            ) / 100.0
+            name_ok = (name_sim >= threshold) & self._has_name
+            score += np.where(name_ok, name_sim, 0.0)
+            matches += name_ok
+        
+        if "brand" in match_by:
+            brand_sim = process.cdist(
+                [utils.default_process(brand) if brand else "" for _, brand in queries],
+                self._brands_proc,
+                scorer=_SCORER,
+                processor=None,
+                score_cutoff=threshold * 100,
+                dtype=np.float64,
+                workers=-1,
+            ) / 100.0
+            has_brand = (
+                np.array([bool(brand) for _, brand in queries])[:, None]
+                & self._has_brand[None, :]
+            )
+            brand_ok = (brand_sim >= threshold) & has_brand
+            score += np.where(brand_ok, brand_sim * 0.5, 0.0)  # Brand is less important
+            matches += brand_ok
+            # Both sides name a brand and it doesn't match: product is ruled out
+            matches[has_brand & ~brand_ok] = 0
+        
+        # Name-only matches must also clear the stricter order-insensitive cutoff
+        name_only = name_ok & ~brand_ok
+        if name_only.any():
+            strict_sim = process.cdist(
+                names_proc,
+                self._names_proc,
+                scorer=_STRICT_SCORER,
+                processor=None,
+                score_cutoff=_NAME_ONLY_CUTOFF * 100,
+                dtype=np.float64,
+                workers=-1,
+            ) / 100.0
+            matches[name_only & (strict_sim < _NAME_ONLY_CUTOFF)] = 0
+        
+        normalized = np.divide(score, matches, out=np.zeros(shape), where=matches > 0)
+        best_idx = np.argmax(normalized, axis=1)
+        best_scores = normalized[np.arange(len(queries)), best_idx]
+        
+        # Same exact-name override as find_affiliate_link: argmax would return
+        # the first product scoring 1.0, which may be a superset name
+        if "product_name" in match_by:
+            for i, (name, brand) in enumerate(queries):
+                if not ("brand" in match_by and brand):
+                    hit = self._exact_index.get(name.lower())
+                    if hit is not None:
+                        best_idx[i], best_scores[i] = hit, 1.0
+        
+        return [
+            self._format_match(products[idx], float(best))
+            if best > 0 and best >= threshold else None
+            for idx, best in zip(best_idx, best_scores)
+        ]
+    
+    def _format_match(self, product: Dict, score: float) -> Dict:
+        """Shape a matched product into the affiliate lookup result dict"""
+        return {
+            "affiliate_link": product.get("affiliate_link"),
+            "affiliate_network": product.get("affiliate_network"),
+            "match_score": score,
+            "metadata": {k: v for k, v in product.items() 
+                       if k not in ["affiliate_link", "affiliate_network"]}
+        }
+    
     def get_all_products(self) -> List[Dict]:
         """Get all affiliate products"""
         return self.affiliate_data.get("products", [])
@@ -166,13 +379,22 @@ class AffiliateProductManager:
         if not self.affiliate_data.get("products"):
             self.affiliate_data["products"] = []
         
-        # Check if product already exists
-        existing = self.find_affiliate_link(product_name, brand, threshold=0.95)
-        if existing:
+        # Check if product already exists — exact key first, fuzzy scan only on a
+        # miss. The fuzzy check uses the strict scorer: under token_set_ratio a
+        # variant like "Biofreeze Pain Relief Gel Roll-On" scores 1.0 against
+        # the plain gel and would be rejected as a duplicate.
+        if _normalize(product_name) in self._name_set or process.extractOne(
+            utils.default_process(product_name),
+            self._names_proc,
+            scorer=_STRICT_SCORER,
+            processor=None,
+            score_cutoff=95,
+        ):
             print(f"⚠️  Product '{product_name}' already exists. Use update_product() instead.")
             return False
         
         self.affiliate_data["products"].append(new_product)
+        self._build_index()
         return self._save_affiliate_data()
     
     def _save_affiliate_data(self) -> bool:
@@ -181,8 +403,12 @@ class AffiliateProductManager:
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.affiliate_data_path), exist_ok=True)
             
-            with open(self.affiliate_data_path, 'w') as f:
-                json.dump(self.affiliate_data, f, indent=2)
+            if orjson is not None:
+                with open(self.affiliate_data_path, 'wb') as f:
+                    f.write(orjson.dumps(self.affiliate_data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(self.affiliate_data_path, 'w') as f:
+                    json.dump(self.affiliate_data, f, indent=2)
             return True
         except Exception as e:
             print(f"❌ Error saving affiliate data: {e}")
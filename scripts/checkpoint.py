@@ -0,0 +1,52 @@
+"""
+Resume checkpoints for long content generation runs.
+
+Each successful Sanity push appends one line to runs/checkpoints/<name>.ndjson,
+so a run that dies partway (rate limits, network, Ctrl-C) can be restarted
+and skip everything already published instead of paying OpenAI for it again.
+FAQs don't need this — their document IDs are known up front and checked
+against Sanity directly (see sanity_lookup). Ingredient guides can't do the
+same: seed_ingredients creates stub documents under the same IDs.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Set
+
+CHECKPOINT_DIR = Path("runs/checkpoints")
+
+
+class PushCheckpoint:
+    """Append-only log of item keys that reached Sanity; safe to record from worker threads"""
+
+    def __init__(self, name: str):
+        self.path = CHECKPOINT_DIR / f"{name}.ndjson"
+        self._lock = threading.Lock()
+        self.pushed: Set[str] = self._load()
+
+    def _load(self) -> Set[str]:
+        pushed = set()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        pushed.add(json.loads(line)["key"])
+                    except (ValueError, KeyError):
+                        continue  # Torn last line from a killed run
+        except FileNotFoundError:
+            pass
+        return pushed
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.pushed
+
+    def record(self, key: str) -> None:
+        """Mark an item as published (written and flushed before returning)"""
+        line = json.dumps({"key": key, "ts": time.time()}) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.pushed.add(key)
@@ -1,36 +1,98 @@
 #!/usr/bin/env python3
 """
 Master content generation runner for TopicalMD.
-Orchestrates all content generators in order:
-  1. Seed products → 2. Seed ingredients → 3. Reviews → 4. Comparisons → 5. Best-for guides → 6. FAQs
+Orchestrates all content generators (imported and run in-process):
+  1. Seed products → 2. Seed ingredients (in order), then
+  3. Reviews, 4. Comparisons, 5. Best-for guides, 6. Ingredient guides, 7. FAQs
+     run concurrently — they only depend on the seeds, not on each other.
 """
 
-import subprocess
+import contextvars
+import importlib
+import io
+import os
 import sys
-import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Generator scripts import their siblings by bare name (e.g. markdown_to_portable_text)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def run_script(name, script_path, args=None):
-    """Run a Python script and return success status."""
-    cmd = [sys.executable, script_path] + (args or [])
-    print(f"\n{'='*60}")
-    print(f"  STEP: {name}")
-    print(f"  Script: {script_path}")
-    print(f"  Started: {datetime.now().strftime('%H:%M:%S')}")
-    print(f"{'='*60}\n")
+_print_lock = threading.Lock()
 
+# Output buffer for the step running in the current context. asyncio tasks and
+# asyncio.to_thread copy the context, so a step's helper threads log to it too.
+_step_output = contextvars.ContextVar("_step_output", default=None)
+
+
+class _StepStream:
+    """sys.stdout/stderr stand-in that routes writes to the current step's buffer."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buf = _step_output.get()
+        return (buf if buf is not None else self._stream).write(text)
+
+    def flush(self):
+        if _step_output.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def run_script(name, module_name, args=None, capture=False):
+    """Import a generator script and run its main() in-process; return success status.
+
+    Runs in the current interpreter so steps skip Python startup and share
+    already-imported modules. With capture=True the step's output is buffered
+    and printed as one block when it finishes, so steps running concurrently
+    don't interleave their logs.
+    """
+    header = (
+        f"\n{'='*60}\n"
+        f"  STEP: {name}\n"
+        f"  Script: scripts/{module_name}.py\n"
+        f"  Started: {datetime.now().strftime('%H:%M:%S')}\n"
+        f"{'='*60}\n"
+    )
+    if not capture:
+        print(header)
+
+    buf = io.StringIO() if capture else None
+    token = _step_output.set(buf)
     try:
-        result = subprocess.run(cmd, capture_output=False, text=True)
-        if result.returncode == 0:
-            print(f"\n  {name} completed successfully.")
-            return True
+        module = importlib.import_module(module_name)
+        if args is None:
+            module.main()
+        else:
+            module.main(args)
+        status = f"\n  {name} completed successfully."
+        success = True
+    except SystemExit as e:
+        if e.code in (None, 0):
+            status = f"\n  {name} completed successfully."
+            success = True
         else:
-            print(f"\n  {name} failed with exit code {result.returncode}")
-            return False
+            status = f"\n  {name} failed with exit code {e.code}"
+            success = False
     except Exception as e:
-        print(f"\n  {name} error: {e}")
-        return False
+        traceback.print_exc()
+        status = f"\n  {name} error: {e}"
+        success = False
+    finally:
+        _step_output.reset(token)
+
+    with _print_lock:
+        if capture:
+            print(header + buf.getvalue() + status, flush=True)
+        else:
+            print(status)
+    return success
 
 
 def main():
@@ -41,6 +103,7 @@ def main():
     max_faqs = "10"
     max_ingredients = "14"
     skip_seeds = False
+    serial = False
 
     for arg in sys.argv[1:]:
         if arg.startswith("--reviews="):
@@ -55,6 +118,8 @@ def main():
             max_ingredients = arg.split("=")[1]
         elif arg == "--skip-seeds":
             skip_seeds = True
+        elif arg == "--serial":
+            serial = True
         elif arg == "--help":
             print("Usage: python scripts/generate_all.py [options]")
             print("Options:")
@@ -64,6 +129,7 @@ def main():
             print("  --faqs=N           Max FAQ articles (default: 10)")
             print("  --ingredients=N    Max ingredient guides (default: 14)")
             print("  --skip-seeds       Skip product & ingredient seeding")
+            print("  --serial           Run generation steps one at a time (for debugging)")
             return
 
     start = datetime.now()
@@ -73,39 +139,38 @@ def main():
 
     results = {}
 
-    # Step 1: Seed products
+    # Steps 1-2: Seeds (everything below depends on them)
     if not skip_seeds:
-        results["Seed Products"] = run_script("Seed Products", "scripts/seed_products.py")
-        time.sleep(1)
-
-        # Step 2: Seed ingredients
-        results["Seed Ingredients"] = run_script("Seed Ingredients", "scripts/seed_ingredients.py")
-        time.sleep(1)
-
-    # Step 3: Generate reviews
-    results["Reviews"] = run_script("Generate Reviews", "scripts/generate_review_blogs.py", [max_reviews])
-    time.sleep(2)
-
-    # Step 4: Generate comparisons
-    results["Comparisons"] = run_script(
-        "Generate Comparisons", "scripts/generate_comparison_blogs.py"
-    )
-    time.sleep(2)
-
-    # Step 5: Generate best-for guides
-    results["Best-For Guides"] = run_script(
-        "Generate Best-For Guides", "scripts/generate_best_for_guides.py", [max_best_for]
-    )
-    time.sleep(2)
-
-    # Step 6: Generate ingredient guides
-    results["Ingredient Guides"] = run_script(
-        "Generate Ingredient Guides", "scripts/generate_ingredient_guides.py", [max_ingredients]
-    )
-    time.sleep(2)
-
-    # Step 7: Generate FAQs
-    results["FAQs"] = run_script("Generate FAQs", "scripts/generate_faqs.py", [max_faqs])
+        results["Seed Products"] = run_script("Seed Products", "seed_products")
+        results["Seed Ingredients"] = run_script("Seed Ingredients", "seed_ingredients")
+
+    # Steps 3-7: Independent generators. Args are passed explicitly so no step
+    # reads this runner's own sys.argv.
+    generation_steps = [
+        ("Reviews", "Generate Reviews", "generate_review_blogs", [max_reviews]),
+        ("Comparisons", "Generate Comparisons", "generate_comparison_blogs", []),
+        ("Best-For Guides", "Generate Best-For Guides", "generate_best_for_guides", [max_best_for]),
+        ("Ingredient Guides", "Generate Ingredient Guides", "generate_ingredient_guides", [max_ingredients]),
+        ("FAQs", "Generate FAQs", "generate_faqs", [max_faqs]),
+    ]
+
+    if serial:
+        for key, name, module_name, args in generation_steps:
+            results[key] = run_script(name, module_name, args)
+    else:
+        print(f"\nRunning {len(generation_steps)} generation steps concurrently...")
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = _StepStream(stdout), _StepStream(stderr)
+        try:
+            with ThreadPoolExecutor(max_workers=len(generation_steps)) as pool:
+                futures = [
+                    (key, pool.submit(run_script, name, module_name, args, True))
+                    for key, name, module_name, args in generation_steps
+                ]
+                for key, future in futures:
+                    results[key] = future.result()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
 
     # Summary
     elapsed = datetime.now() - start
@@ -1,21 +1,26 @@
 #!/usr/bin/env python3
 """Generate 'Best cream for [condition]' roundup articles and push to Sanity CMS."""
 
+import asyncio
 import json
 import os
 import sys
-import time
-from datetime import datetime
+from collections import defaultdict
 
-import requests
 from dotenv import load_dotenv
-from openai import OpenAI
-from slugify import slugify
 
 from markdown_to_portable_text import markdown_to_portable_text
+from llm_cache import cached_complete
+from prompt_common import MARKDOWN_FORMATTING, prompt_fingerprint
+from checkpoint import PushCheckpoint
+from retry_policy import make_openai_client, make_sanity_session, sanity_post
+from sanity_lookup import PUBLISHED_AT
 
 load_dotenv()
-client = OpenAI()
+client = make_openai_client()
+
+# Guides generated at once — keeps us under the OpenAI rate limit
+MAX_CONCURRENCY = 5
 
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
 SANITY_DATASET = os.getenv("SANITY_DATASET", "production")
@@ -26,6 +31,8 @@ SANITY_HEADERS = {
     "Authorization": f"Bearer {SANITY_TOKEN}",
 }
 
+SESSION = make_sanity_session(SANITY_HEADERS)
+
 USE_CASES = [
     {
         "condition": "Arthritis",
@@ -108,22 +115,14 @@ def load_products():
     return data["products"]
 
 
-def generate_best_for_prompt(use_case, products):
-    product_list = "\n".join(
-        [f"- {p['product_name']} ({p['brand']}) - {p.get('active_ingredient', 'N/A')}, {p.get('type', 'cream')}, {p.get('price_range', 'N/A')}" for p in products[:8]]
-    )
-    return f"""You are a medical content writer creating a comprehensive "best of" roundup guide. Write for a health-conscious audience seeking evidence-based recommendations.
-
-Topic: Best Topical Creams for {use_case['condition']}
-Target condition: {use_case['description']}
+SYSTEM_PROMPT = """You are a medical content writer creating a comprehensive "best of" roundup guide. Write for a health-conscious audience seeking evidence-based recommendations.
 
-Available products to consider:
-{product_list}
+The user message gives the topic, target condition, article title, and the available products to consider.
 
 Write a comprehensive guide with the following structure:
 
-1. **Title**: "Best Topical Creams for {use_case['condition']} in 2025: Expert Picks"
-2. **Introduction** (200 words): Why topical treatments matter for {use_case['condition']}. Briefly explain the condition and how topical treatments help. Cite medical sources (Mayo Clinic, Arthritis Foundation, NIH).
+1. **Title**: Use the article title given in the user message
+2. **Introduction** (200 words): Why topical treatments matter for the condition. Briefly explain the condition and how topical treatments help. Cite medical sources (Mayo Clinic, Arthritis Foundation, NIH).
 3. **How We Chose** (100 words): Evaluation criteria - ingredient effectiveness, clinical evidence, user reviews, value, ease of use.
 4. **Top Picks** (main section): For each recommended product (5-7 products):
    - Product name and brief description
@@ -136,21 +135,51 @@ Write a comprehensive guide with the following structure:
 6. **How to Choose the Right Cream** (200 words): Factors to consider, ingredient types to look for
 7. **How to Use Topical Pain Creams Effectively**: Application tips, frequency, when to see results
 8. **When to See a Doctor**: Red flags, signs topical treatment isn't enough
-9. **FAQ**: 4-5 frequently asked questions about topical treatments for {use_case['condition']}
+9. **FAQ**: 4-5 frequently asked questions about topical treatments for the condition
 10. **Medical Disclaimer**
 
 Include E-E-A-T signals throughout. Mention HSA/FSA eligibility where applicable. Use rel="sponsored" notes for product links. Do NOT fabricate clinical trial data.
 
-FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, - for bullet lists, 1. for numbered lists, **bold** for emphasis."""
+""" + MARKDOWN_FORMATTING
+
+
+# Per-guide user message, filled via str.format
+_PROMPT_TMPL = """Topic: Best Topical Creams for {condition}
+Target condition: {description}
+Article title: "Best Topical Creams for {condition} in 2025: Expert Picks"
+
+Available products to consider:
+{product_list}"""
+
+
+def generate_best_for_prompt(use_case, products):
+    """Build the per-guide user message; the shared instructions live in SYSTEM_PROMPT."""
+    product_list = "\n".join(
+        "- {name} ({brand}) - {ing}, {typ}, {price}".format_map({
+            "name": p["product_name"],
+            "brand": p["brand"],
+            "ing": p.get("active_ingredient", "N/A"),
+            "typ": p.get("type", "cream"),
+            "price": p.get("price_range", "N/A"),
+        })
+        for p in products[:8]
+    )
+    return _PROMPT_TMPL.format(
+        condition=use_case["condition"],
+        description=use_case["description"],
+        product_list=product_list,
+    )
 
 
 def push_to_sanity(use_case, content, prompt):
     title = f"Best Topical Creams for {use_case['condition']} in 2025: Expert Picks"
     slug = f"best-creams-for-{use_case['slug']}"
-    lines = [l.strip() for l in content.splitlines() if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 30]
-    excerpt = lines[0][:300] if lines else f"Our expert picks for the best topical pain relief creams for {use_case['condition']}."
+    # Strip each line once and stop at the first substantial non-heading line
+    stripped = (l.strip() for l in content.splitlines())
+    first_line = next((l for l in stripped if len(l) > 30 and not l.startswith("#")), None)
+    excerpt = first_line[:300] if first_line else f"Our expert picks for the best topical pain relief creams for {use_case['condition']}."
 
-    intro_text = lines[0] if lines else excerpt
+    intro_text = first_line or excerpt
 
     doc = {
         "mutations": [
@@ -160,7 +189,7 @@ def push_to_sanity(use_case, content, prompt):
                     "_id": f"usecase-{slug}",
                     "title": title,
                     "slug": {"_type": "slug", "current": slug},
-                    "publishedAt": datetime.utcnow().isoformat() + "Z",
+                    "publishedAt": PUBLISHED_AT,
                     "excerpt": excerpt,
                     "categories": use_case["categories"],
                     "tags": [use_case["condition"].lower(), "best-for", "roundup", "2025"],
@@ -174,35 +203,80 @@ def push_to_sanity(use_case, content, prompt):
         ]
     }
 
-    response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=doc)
+    response = sanity_post(SANITY_URL, session=SESSION, json=doc, timeout=30)
     if response.status_code == 200:
         print(f"  Published: {title}")
-    else:
-        print(f"  Failed: {response.text[:200]}")
+        return True
+    print(f"  Failed: {response.text[:200]}")
+    return False
+
+
+async def generate_guide(use_case, products, sem, label, checkpoint):
+    try:
+        async with sem:
+            print(f"\n{label} Generating: Best for {use_case['condition']}")
+            prompt = generate_best_for_prompt(use_case, products)
+            content = await cached_complete(
+                client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
+            )
+        # Only the OpenAI call holds a slot — the next generation starts while this
+        # (blocking) Sanity push runs off the event loop
+        if await asyncio.to_thread(push_to_sanity, use_case, content, prompt):
+            checkpoint.record(use_case["slug"])
+    except Exception as e:
+        print(f"  Error ({use_case['condition']}): {e}")
 
 
-def main():
+async def main_async(max_count, force=False):
+    print(f"System prompt {prompt_fingerprint(SYSTEM_PROMPT)} ({len(SYSTEM_PROMPT)} chars)")
     products = load_products()
-    max_count = int(sys.argv[1]) if len(sys.argv) > 1 else len(USE_CASES)
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    checkpoint = PushCheckpoint("best_for_guides")
+    use_cases = USE_CASES
+    if not force:
+        use_cases = [uc for uc in USE_CASES if uc["slug"] not in checkpoint]
+        if len(use_cases) < len(USE_CASES):
+            print(f"⏩ Skipping {len(USE_CASES) - len(use_cases)} guides published by an earlier run (use --force to regenerate)")
+    use_cases = use_cases[:max_count]
 
-    for i, use_case in enumerate(USE_CASES[:max_count]):
-        print(f"\n[{i+1}/{max_count}] Generating: Best for {use_case['condition']}")
-        relevant = [p for p in products if p.get("category") in use_case["categories"] or p.get("use_case") in [use_case["slug"], use_case["condition"].lower()]]
+    # Index product positions by category/use case once instead of rescanning per guide
+    by_cat = defaultdict(list)
+    by_uc = defaultdict(list)
+    for idx, p in enumerate(products):
+        by_cat[p.get("category")].append(idx)
+        by_uc[p.get("use_case")].append(idx)
+
+    tasks = []
+    for i, use_case in enumerate(use_cases):
+        hits = {idx for c in use_case["categories"] for idx in by_cat.get(c, ())}
+        for uc in (use_case["slug"], use_case["condition"].lower()):
+            hits.update(by_uc.get(uc, ()))
+        relevant = [products[idx] for idx in sorted(hits)]  # keep catalog order
         if len(relevant) < 3:
             relevant = products[:8]
+        tasks.append(generate_guide(use_case, relevant, sem, f"[{i+1}/{len(use_cases)}]", checkpoint))
+
+    await asyncio.gather(*tasks)
+    return len(use_cases)
 
-        try:
-            prompt = generate_best_for_prompt(use_case, relevant)
-            response = client.chat.completions.create(
-                model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.7
-            )
-            content = response.choices[0].message.content
-            push_to_sanity(use_case, content, prompt)
-            time.sleep(2)
-        except Exception as e:
-            print(f"  Error: {e}")
 
-    print(f"\nDone! Generated {min(max_count, len(USE_CASES))} best-for guides.")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    force = "--force" in argv
+    argv = [a for a in argv if a != "--force"]
+    max_count = int(argv[0]) if argv else len(USE_CASES)
+    try:
+        count = asyncio.run(main_async(max_count, force))
+    finally:
+        SESSION.close()
+    print(f"\nDone! Generated {count} best-for guides.")
 
 
 if __name__ == "__main__":
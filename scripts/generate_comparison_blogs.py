@@ -1,5 +1,3 @@
-import pandas as pd
-
 """
 NOTE:
 This script currently reads comparison data from a local JSON file.
@@ -10,24 +8,36 @@ In future versions, product data may come from:
 The JSON structure should remain consistent, containing product_a, product_b, and use_case fields.
 """
 from pathlib import Path
-from openai import OpenAI
 from dotenv import load_dotenv
-from datetime import datetime
+import asyncio
 import json
-import time
 import os
 import sys
 
-import requests
 from slugify import slugify
 
+try:
+    import orjson
+except ImportError:  # Optional speedup — stdlib json is used as a fallback
+    orjson = None
+
 # Import affiliate manager
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from affiliate_manager import AffiliateProductManager
 from markdown_to_portable_text import markdown_to_portable_text
+from llm_cache import cached_complete
+from prompt_common import MARKDOWN_FORMATTING, prompt_fingerprint
+from openai_batch import finish_batch, run_batch
+from retry_policy import make_openai_client, make_sanity_session, sanity_post
+from sanity_lookup import PUBLISHED_AT
 
 load_dotenv()
-client = OpenAI()
+client = make_openai_client()
+
+# Blogs generated at once — keeps us under the OpenAI rate limit
+MAX_CONCURRENCY = 5
+# Max new blogs per run
+MAX_BLOGS = 10
 
 # Sanity configuration
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
@@ -41,25 +51,17 @@ SANITY_HEADERS = {
     "Authorization": f"Bearer {SANITY_TOKEN}"
 }
 
+SESSION = make_sanity_session(SANITY_HEADERS)
+
 # Initialize affiliate manager
 affiliate_manager = AffiliateProductManager("data/affiliate_products.json")
 
 # Set your OpenAI API key here or export it as an environment variable
 # openai.api_key = os.getenv("OPENAI_API_KEY") or "your-api-key-here"
 
-# Load comparison data
-filename = "scripts/arthritis_product_comparisons.json"
-filename = sys.argv[1] if len(sys.argv) > 1 else "scripts/arthritis_product_comparisons.json"
-with open(filename) as f:
-    comparisons = json.load(f)
+DEFAULT_COMPARISONS_FILE = "scripts/arthritis_product_comparisons.json"
 
-# Function to generate prompt
-def generate_comparison_prompt(pair):
-    a = pair["product_a"]
-    b = pair["product_b"]
-    use_case = pair["use_case"].capitalize()
-
-    return f"""You are a professional medical writer creating an informative comparison blog post designed for both human readers and search engine AI systems like Google AI Overview.
+SYSTEM_PROMPT = """You are a professional medical writer creating an informative comparison blog post designed for both human readers and search engine AI systems like Google AI Overview.
 
 Compare two over-the-counter topical pain relief products, using a clear, fact-based tone that prioritizes clarity, accuracy, and reader usability.
 
@@ -71,9 +73,52 @@ Your goal is to help readers quickly understand:
 - Which one might be better depending on user needs
 - Any cost, size, or ingredient differences
 
-Use the following product data as reference for generating the comparison content.
+Use the product data in the user message as reference for generating the comparison content.
+
+Respond with a JSON object with these fields:
+- "title": the blog post title (clear and SEO-optimized)
+- "excerpt": a one or two sentence summary of the comparison, under 300 characters
+- "body": the full blog post in Markdown, without the title
+
+Structure the body with the following:
+1. Introduction (why this comparison matters)
+2. Individual Product Overview
+3. Comparison Table (if appropriate)
+4. Pros and Cons for each
+5. Who Each Product is Best For
+6. Final Verdict
+7. Medical Disclaimer
 
-### Product A: {a['product_name']}
+Use a helpful, unbiased tone similar to Healthline or Verywell Health. Avoid copying the bullet points verbatim. Write short, scannable paragraphs and avoid fluff.
+
+""" + MARKDOWN_FORMATTING
+
+# Structured output — title and excerpt come back as their own fields instead of
+# being scraped out of the markdown
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "comparison_blog",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "excerpt": {"type": "string"},
+                "body": {"type": "string"},
+            },
+            "required": ["title", "excerpt", "body"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Function to generate the per-pair user message (product data only)
+def generate_comparison_prompt(pair):
+    a = pair["product_a"]
+    b = pair["product_b"]
+
+    return f"""### Product A: {a['product_name']}
 - Brand: {a['brand']}
 - Form: {a['form']}
 - Active Ingredients: {a['active_ingredients']}
@@ -95,50 +140,49 @@ Use the following product data as reference for generating the comparison conten
 - Generic: {"Yes" if b['is_generic'] else "No"}
 - Price: {b['price_range_usd']}
 - Size: {b['size_g']}g
-- Notes: {b['notes']}
-
-Structure the blog post with the following:
-1. Title (clear and SEO-optimized)
-2. Introduction (why this comparison matters)
-3. Individual Product Overview
-4. Comparison Table (if appropriate)
-5. Pros and Cons for each
-6. Who Each Product is Best For
-7. Final Verdict
-8. Medical Disclaimer
-
-Use a helpful, unbiased tone similar to Healthline or Verywell Health. Avoid copying the bullet points verbatim. Write short, scannable paragraphs and avoid fluff.
-
-FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, - for bullet lists, 1. for numbered lists, **bold** for emphasis."""
+- Notes: {b['notes']}"""
 
 # Output folder
 output_dir = "generated_blogs"
-os.makedirs(output_dir, exist_ok=True)
-existing_blogs = {f.name for f in Path(output_dir).glob("blog_*.md")}
+
+# Product lookups by (name, brand) -> (product ID, mutation) for this run. The same
+# cream shows up in many pairs, so this saves a GROQ query per repeat. Mutations are
+# kept (createIfNotExists is idempotent) so every comparison that references a new
+# product also carries its create, whichever transaction lands first.
+_product_cache = {}
+
+# Parameterized so product names containing quotes can't break the query
+PRODUCT_ID_QUERY = '*[_type == "product" && name == $name && brand == $brand][0]._id'
 
 # Product management functions
 def find_or_create_product(product_data, pair_key):
     """
-    Find existing product in Sanity or create a new one with affiliate link.
-    Returns the product document ID.
+    Find existing product in Sanity or build the mutation that creates it with affiliate link.
+    Returns (product document ID, createIfNotExists mutation or None if it already exists).
+    The caller sends the mutation in the same transaction as the comparison.
     """
     product_name = product_data['product_name']
     brand = product_data.get('brand', '')
     
-    # Try to find existing product
-    query = f'*[_type == "product" && name == "{product_name}" && brand == "{brand}"][0]'
+    cache_key = (product_name, brand)
+    if cache_key in _product_cache:
+        return _product_cache[cache_key]
+    
+    # Try to find existing product — one canonical query string, values passed as params
     query_doc = {
-        "query": query
+        "query": PRODUCT_ID_QUERY,
+        "params": {"name": product_name, "brand": brand}
     }
     
     try:
-        response = requests.post(SANITY_QUERY_URL, headers=SANITY_HEADERS, json=query_doc)
+        response = sanity_post(SANITY_QUERY_URL, session=SESSION, json=query_doc, timeout=30)
         if response.status_code == 200:
             result = response.json()
             if result.get('result'):
-                product_id = result['result']['_id']
+                product_id = result['result']
                 print(f"  ✓ Found existing product: {product_name}")
-                return product_id
+                _product_cache[cache_key] = (product_id, None)
+                return product_id, None
     except Exception as e:
         print(f"  ⚠️  Error querying for product: {e}")
     
@@ -158,47 +202,36 @@ def find_or_create_product(product_data, pair_key):
     # Extract price from price_range_usd if available
     price = product_data.get('price_range_usd', '')
     
-    product_doc = {
-        "mutations": [
-            {
-                "createOrReplace": {
-                    "_type": "product",
-                    "_id": product_id,
-                    "name": product_name,
-                    "brand": brand,
-                    "form": product_data.get('form', ''),
-                    "applicationType": product_data.get('application_type', ''),
-                    "price": price,
-                    "size": f"{product_data.get('size_g', '')}g" if product_data.get('size_g') else '',
-                    "OTC": product_data.get('otc_rx', '').upper() == 'OTC',
-                    "isGeneric": product_data.get('is_generic', False),
-                    "affiliateLink": affiliate_link,
-                    "region": [r.strip() for r in product_data.get('available_in', '').split(',')] if product_data.get('available_in') else []
-                }
-            }
-        ]
+    # createIfNotExists keeps re-runs idempotent
+    mutation = {
+        "createIfNotExists": {
+            "_type": "product",
+            "_id": product_id,
+            "name": product_name,
+            "brand": brand,
+            "form": product_data.get('form', ''),
+            "applicationType": product_data.get('application_type', ''),
+            "price": price,
+            "size": f"{product_data.get('size_g', '')}g" if product_data.get('size_g') else '',
+            "OTC": product_data.get('otc_rx', '').upper() == 'OTC',
+            "isGeneric": product_data.get('is_generic', False),
+            "affiliateLink": affiliate_link,
+            "region": [r.strip() for r in product_data.get('available_in', '').split(',')] if product_data.get('available_in') else []
+        }
     }
-    
-    try:
-        response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=product_doc)
-        if response.status_code == 200:
-            print(f"  ✅ Created/updated product: {product_name}")
-            return product_id
-        else:
-            print(f"  ❌ Failed to create product: {response.text}")
-            return None
-    except Exception as e:
-        print(f"  ❌ Error creating product: {e}")
-        return None
+    _product_cache[cache_key] = (product_id, mutation)
+    return product_id, mutation
 
 # Generate and save blog posts
-def push_to_sanity(title, content, slug, prompt, pair):
+def push_to_sanity(title, content, slug, prompt, pair, excerpt=None):
     lines = content.splitlines()
+    first_paragraph = next((l.strip() for l in lines if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 30), "")
     
     # Create or find products in Sanity and get their IDs
     print(f"  Creating/finding products in Sanity...")
-    product_a_id = find_or_create_product(pair['product_a'], 'product_a')
-    product_b_id = find_or_create_product(pair['product_b'], 'product_b')
+    product_a_id, product_a_mutation = find_or_create_product(pair['product_a'], 'product_a')
+    product_b_id, product_b_mutation = find_or_create_product(pair['product_b'], 'product_b')
+    product_mutations = [m for m in (product_a_mutation, product_b_mutation) if m]
     
     # Store product data as objects (for comparison table) but also reference product documents
     products = [
@@ -242,81 +275,171 @@ def push_to_sanity(title, content, slug, prompt, pair):
         }
     ]
 
+    # Products and comparison go in one transaction: one round-trip, and no
+    # orphaned products if the comparison write fails
     doc = {
-        "mutations": [
+        "mutations": product_mutations + [
             {
                 "createOrReplace": {
                     "_type": "comparison",
                     "_id": f"comparison-{slug}",
                     "title": title,
                     "slug": { "_type": "slug", "current": slug },
-                    "excerpt": next((l.strip() for l in lines if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 30), f"A comparison of {pair['product_a']['product_name']} and {pair['product_b']['product_name']}.")[:300],
-                    "introduction": markdown_to_portable_text(next((l.strip() for l in lines if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 30), "")),
+                    "excerpt": (excerpt or first_paragraph or f"A comparison of {pair['product_a']['product_name']} and {pair['product_b']['product_name']}.")[:300],
+                    "introduction": markdown_to_portable_text(first_paragraph),
                     "products": products,
                     "content": markdown_to_portable_text(content),
                     "sourcePrompt": prompt,
                     "sourceModel": "gpt-4o",
-                    "publishedAt": datetime.utcnow().isoformat() + "Z"
+                    "publishedAt": PUBLISHED_AT
                 }
             }
         ]
     }
 
-    response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=doc)
+    response = sanity_post(SANITY_URL, session=SESSION, json=doc, timeout=30)
     if response.status_code == 200:
+        for m in product_mutations:
+            print(f"  ✅ Created product: {m['createIfNotExists']['name']}")
         print(f"✅ Successfully pushed blog to Sanity: {slug}")
     else:
         print(f"❌ Failed to push to Sanity: {response.text}")
 
-blog_count = 0
-for i, pair in enumerate(comparisons):
-    blog_filename = f"blog_{i+1}.md"
-    if blog_filename in existing_blogs:
-        print(f"⏩ Skipping {blog_filename}, already exists.")
-        continue
-    if blog_count >= 10:
-        break
+def extract_title(blog_content, pair):
+    """Pull the article title out of generated markdown, falling back to 'A vs B'"""
+    for line in blog_content.splitlines():
+        cleaned = line.strip().lstrip("#").strip()
+        if not cleaned or len(cleaned) < 10:
+            continue
+        cleaned = cleaned.replace("**", "").strip()
+        # Handle "1. Title: ..." format
+        if cleaned.lower().startswith(("1. title:", "title:")):
+            return cleaned.split(":", 1)[1].strip().strip('"')
+        # Otherwise use first substantial heading/line as title
+        if not cleaned.lower().startswith(("1.", "2.", "3.")):
+            return cleaned
+    return f"{pair['product_a']['product_name']} vs {pair['product_b']['product_name']}"
+
+def parse_blog(raw, pair):
+    """
+    Split a completion into (title, excerpt, markdown body)
 
+    Completions are JSON per RESPONSE_FORMAT; plain markdown (e.g. a cache entry
+    from before structured output) falls back to scraping the title.
+    """
     try:
-        prompt = generate_comparison_prompt(pair)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        blog_content = response.choices[0].message.content
-
-        with open(f"{output_dir}/{blog_filename}", "w") as f:
-            f.write(blog_content)
-
-# inside the for i, pair in enumerate(comparisons) loop
-
-        # Extract title and slug, then push to Sanity
-        lines = blog_content.splitlines()
-        title = None
-        for line in lines:
-            cleaned = line.strip().lstrip("#").strip()
-            if not cleaned or len(cleaned) < 10:
-                continue
-            cleaned = cleaned.replace("**", "").strip()
-            # Handle "1. Title: ..." format
-            if cleaned.lower().startswith(("1. title:", "title:")):
-                title = cleaned.split(":", 1)[1].strip().strip('"')
-                break
-            # Otherwise use first substantial heading/line as title
-            if not cleaned.lower().startswith(("1.", "2.", "3.")):
-                title = cleaned
-                break
-        if not title:
-            title = f"{pair['product_a']['product_name']} vs {pair['product_b']['product_name']}"
-        slug = slugify(title)
-
-        print(f"Pushing: {pair['product_a']['product_name']} vs {pair['product_b']['product_name']}")
-        push_to_sanity(title, blog_content, slug, prompt, pair)
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        return data["title"].strip(), data["excerpt"].strip(), data["body"]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return extract_title(raw, pair), None, raw
+
+def save_and_push(blog_filename, pair, raw_content, prompt):
+    title, excerpt, body = parse_blog(raw_content, pair)
+    slug = slugify(title)
+
+    # Runs in a worker thread (see generate_blog), so the write never blocks the event loop
+    (Path(output_dir) / blog_filename).write_text(f"# {title}\n\n{body}", encoding="utf-8")
+
+    print(f"Pushing: {pair['product_a']['product_name']} vs {pair['product_b']['product_name']}")
+    push_to_sanity(title, body, slug, prompt, pair, excerpt)
+
+async def generate_blog(i, pair, sem):
+    try:
+        async with sem:
+            prompt = generate_comparison_prompt(pair)
+            blog_content = await cached_complete(
+                client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                response_format=RESPONSE_FORMAT
+            )
+
+        # Only the OpenAI call holds a slot — the next generation starts while this
+        # (blocking) file write + Sanity push runs off the event loop
+        await asyncio.to_thread(save_and_push, f"blog_{i+1}.md", pair, blog_content, prompt)
 
         print(f"✅ Blog {i+1} saved.")
-        blog_count += 1
-        time.sleep(1.5)
+        return True
 
     except Exception as e:
-        print(f"❌ Error with blog {i+1}: {e}")
\ No newline at end of file
+        print(f"❌ Error with blog {i+1}: {e}")
+        return False
+
+async def generate_blogs_batch(pending):
+    """Generate all blogs through the Batch API (~50% cheaper, up to 24h), then save and publish them"""
+    prompts = {f"blog_{i+1}": generate_comparison_prompt(pair) for i, pair in pending}
+    results = await run_batch(client, "comparisons", {
+        custom_id: {
+            "model": "gpt-4o",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "response_format": RESPONSE_FORMAT
+        }
+        for custom_id, prompt in prompts.items()
+    })
+
+    async def publish(i, pair):
+        custom_id = f"blog_{i+1}"
+        if custom_id not in results:
+            print(f"❌ No batch result for blog {i+1}")
+            return False
+        try:
+            await asyncio.to_thread(save_and_push, f"{custom_id}.md", pair, results[custom_id], prompts[custom_id])
+            print(f"✅ Blog {i+1} saved.")
+            return True
+        except Exception as e:
+            print(f"❌ Error with blog {i+1}: {e}")
+            return False
+
+    published = await asyncio.gather(*[publish(i, pair) for i, pair in pending])
+    finish_batch("comparisons")
+    return published
+
+async def main_async(comparisons, existing_blogs, batch=False):
+    print(f"System prompt {prompt_fingerprint(SYSTEM_PROMPT)} ({len(SYSTEM_PROMPT)} chars)")
+    # Decide the full work list up front so the MAX_BLOGS cap is exact — nothing
+    # beyond it is ever scheduled (and paid for) under concurrency
+    todo = [(i, pair) for i, pair in enumerate(comparisons) if f"blog_{i+1}.md" not in existing_blogs]
+    if len(todo) < len(comparisons):
+        print(f"⏩ Skipping {len(comparisons) - len(todo)} blogs that already exist.")
+    pending = todo[:MAX_BLOGS]
+
+    if batch:
+        return sum(await generate_blogs_batch(pending))
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    results = await asyncio.gather(*[generate_blog(i, pair, sem) for i, pair in pending])
+    return sum(results)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    batch = "--batch" in argv
+    argv = [a for a in argv if a != "--batch"]
+
+    # Load comparison data
+    filename = argv[0] if argv else DEFAULT_COMPARISONS_FILE
+    if orjson is not None:
+        comparisons = orjson.loads(Path(filename).read_bytes())
+    else:
+        with open(filename) as f:
+            comparisons = json.load(f)
+
+    os.makedirs(output_dir, exist_ok=True)
+    existing_blogs = {f.name for f in Path(output_dir).glob("blog_*.md")}
+
+    try:
+        blog_count = asyncio.run(main_async(comparisons, existing_blogs, batch))
+    finally:
+        SESSION.close()
+    print(f"\nDone! Generated {blog_count} comparison blogs.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,40 @@
 #!/usr/bin/env python3
 """Generate FAQ content with proper titles and push to Sanity CMS."""
 
+import asyncio
 import os
+import re
 import sys
-import time
-from datetime import datetime
+from functools import lru_cache
 
-import requests
 from dotenv import load_dotenv
-from openai import OpenAI
 from slugify import slugify
 
 from markdown_to_portable_text import markdown_to_portable_text
+from llm_cache import cached_complete
+from prompt_common import MARKDOWN_FORMATTING, prompt_fingerprint
+from openai_batch import finish_batch, run_batch
+from retry_policy import make_openai_client, make_sanity_session, sanity_post
+from sanity_lookup import PUBLISHED_AT, fetch_existing_ids
 
 load_dotenv()
-client = OpenAI()
+client = make_openai_client()
+
+# FAQs generated at once — keeps us under the OpenAI rate limit
+MAX_CONCURRENCY = 5
 
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
 SANITY_DATASET = os.getenv("SANITY_DATASET", "production")
 SANITY_TOKEN = os.getenv("SANITY_API_TOKEN")
 SANITY_URL = f"https://{SANITY_PROJECT_ID}.api.sanity.io/v2025-06-27/data/mutate/{SANITY_DATASET}"
+SANITY_QUERY_URL = f"https://{SANITY_PROJECT_ID}.api.sanity.io/v2025-06-27/data/query/{SANITY_DATASET}"
 SANITY_HEADERS = {
     "Content-Type": "application/json",
     "Authorization": f"Bearer {SANITY_TOKEN}",
 }
 
+SESSION = make_sanity_session(SANITY_HEADERS)
+
 FAQ_TOPICS = [
     "What is the strongest over-the-counter pain relief cream?",
     "Can I use topical pain cream with oral pain medication?",
@@ -49,10 +59,9 @@ FAQ_TOPICS = [
 ]
 
 
-def generate_faq_prompt(question):
-    return f"""You are a medical content writer creating a comprehensive FAQ answer for a topical pain relief information website. Write in a clear, authoritative, evidence-based tone.
+SYSTEM_PROMPT = """You are a medical content writer creating a comprehensive FAQ answer for a topical pain relief information website. Write in a clear, authoritative, evidence-based tone.
 
-Question: {question}
+The user message gives the question to answer.
 
 Write a thorough answer that includes:
 
@@ -64,32 +73,43 @@ Write a thorough answer that includes:
 
 The answer should be medically accurate, helpful, and optimized for Google's featured snippets. Use short paragraphs and clear headings. Do NOT start with the question repeated.
 
-FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, - for bullet lists, 1. for numbered lists, **bold** for emphasis."""
+""" + MARKDOWN_FORMATTING
+
+
+def generate_faq_prompt(question):
+    """Build the per-FAQ user message; the shared instructions live in SYSTEM_PROMPT."""
+    return f"Question: {question}"
+
+
+# "## Sources" / "**Sources:**" heading up to the next heading; group 1 is the body
+_SOURCES_RE = re.compile(
+    r"^\s*(?:\d+\.\s*)?(?:#{2,3}|\*\*)\s*(?:\d+\.\s*)?sources?\b[^\n]*\n(.*?)(?=^\s*(?:\d+\.\s*)?(?:#{1,3}\s|\*\*)|\Z)",
+    re.I | re.M | re.S,
+)
+# "- Title: https://url" bullets; the URL is optional
+_BULLET_RE = re.compile(r"^\s*(?:[-•]|\*(?!\*))\s*(.+?)(?:\s*(https?://\S+))?\s*$", re.M)
+
+
+@lru_cache(maxsize=None)
+def faq_slug(question):
+    return slugify(question)[:96]
 
 
 def push_faq_to_sanity(question, content, prompt):
     title = question
-    slug = slugify(question)[:96]
+    slug = faq_slug(question)
     lines = [l.strip() for l in content.splitlines() if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 20]
     excerpt = lines[0][:300] if lines else question
 
     # Extract sources
     sources = []
-    in_sources = False
-    for line in content.splitlines():
-        lower = line.strip().lower()
-        if "source" in lower and ("##" in lower or "**" in lower):
-            in_sources = True
-            continue
-        if in_sources and line.strip().startswith(("-", "*", "•")):
-            source_text = line.strip().lstrip("-*•").strip()
-            if "http" in source_text:
-                parts = source_text.split("http", 1)
-                sources.append({"_type": "object", "_key": f"src-{len(sources)}", "title": parts[0].strip().rstrip(":- "), "url": "http" + parts[1].strip().rstrip(")")})
-            else:
-                sources.append({"_type": "object", "_key": f"src-{len(sources)}", "title": source_text})
-        elif in_sources and line.strip().startswith(("##", "**")) and "source" not in lower:
-            in_sources = False
+    m = _SOURCES_RE.search(content)
+    if m:
+        for source_title, url in _BULLET_RE.findall(m.group(1)):
+            source = {"_type": "object", "_key": f"src-{len(sources)}", "title": source_title.strip().rstrip(":-( ")}
+            if url:
+                source["url"] = url.rstrip(").,")
+            sources.append(source)
 
     doc = {
         "mutations": [
@@ -99,7 +119,7 @@ def push_faq_to_sanity(question, content, prompt):
                     "_id": f"faq-{slug}",
                     "title": title,
                     "slug": {"_type": "slug", "current": slug},
-                    "publishedAt": datetime.utcnow().isoformat() + "Z",
+                    "publishedAt": PUBLISHED_AT,
                     "excerpt": excerpt,
                     "answer": markdown_to_portable_text(content),
                     "sources": sources[:5] if sources else [],
@@ -108,30 +128,97 @@ def push_faq_to_sanity(question, content, prompt):
         ]
     }
 
-    response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=doc)
+    response = sanity_post(SANITY_URL, session=SESSION, json=doc, timeout=30)
     if response.status_code == 200:
         print(f"  Published FAQ: {title[:60]}...")
     else:
         print(f"  Failed: {response.text[:200]}")
 
 
-def main():
-    max_count = int(sys.argv[1]) if len(sys.argv) > 1 else len(FAQ_TOPICS)
-
-    for i, question in enumerate(FAQ_TOPICS[:max_count]):
-        print(f"\n[{i+1}/{max_count}] Generating FAQ: {question[:60]}...")
-        try:
+async def generate_faq(question, sem, label):
+    try:
+        async with sem:
+            print(f"\n{label} Generating FAQ: {question[:60]}...")
             prompt = generate_faq_prompt(question)
-            response = client.chat.completions.create(
-                model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.7
+            content = await cached_complete(
+                client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
             )
-            content = response.choices[0].message.content
-            push_faq_to_sanity(question, content, prompt)
-            time.sleep(1.5)
+        # Only the OpenAI call holds a slot — the next generation starts while this
+        # (blocking) Sanity push runs off the event loop
+        await asyncio.to_thread(push_faq_to_sanity, question, content, prompt)
+    except Exception as e:
+        print(f"  Error ({question[:40]}): {e}")
+
+
+async def generate_faqs_batch(topics):
+    """Generate all FAQs through the Batch API (~50% cheaper, up to 24h), then publish them"""
+    prompts = {f"faq-{faq_slug(q)}": generate_faq_prompt(q) for q in topics}
+    results = await run_batch(client, "faqs", {
+        custom_id: {
+            "model": "gpt-4o",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.7,
+        }
+        for custom_id, prompt in prompts.items()
+    })
+
+    async def publish(question):
+        custom_id = f"faq-{faq_slug(question)}"
+        if custom_id not in results:
+            print(f"  No batch result for: {question[:60]}")
+            return
+        try:
+            await asyncio.to_thread(push_faq_to_sanity, question, results[custom_id], prompts[custom_id])
         except Exception as e:
-            print(f"  Error: {e}")
-
-    print(f"\nDone! Generated {min(max_count, len(FAQ_TOPICS))} FAQs.")
+            print(f"  Error ({question[:40]}): {e}")
+
+    await asyncio.gather(*[publish(q) for q in topics])
+    finish_batch("faqs")
+
+
+async def main_async(max_count, force=False, batch=False):
+    print(f"System prompt {prompt_fingerprint(SYSTEM_PROMPT)} ({len(SYSTEM_PROMPT)} chars)")
+    topics = FAQ_TOPICS
+    if not force:
+        # One query for everything already published — skip those instead of regenerating
+        existing = await asyncio.to_thread(fetch_existing_ids, SESSION, SANITY_QUERY_URL, "faq")
+        topics = [q for q in FAQ_TOPICS if f"faq-{faq_slug(q)}" not in existing]
+        if len(topics) < len(FAQ_TOPICS):
+            print(f"⏩ Skipping {len(FAQ_TOPICS) - len(topics)} FAQs already in Sanity (use --force to regenerate)")
+    topics = topics[:max_count]
+
+    if batch:
+        await generate_faqs_batch(topics)
+        return len(topics)
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    await asyncio.gather(*[
+        generate_faq(question, sem, f"[{i+1}/{len(topics)}]")
+        for i, question in enumerate(topics)
+    ])
+    return len(topics)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    force = "--force" in argv
+    batch = "--batch" in argv
+    argv = [a for a in argv if a not in ("--force", "--batch")]
+    max_count = int(argv[0]) if argv else len(FAQ_TOPICS)
+    try:
+        count = asyncio.run(main_async(max_count, force, batch))
+    finally:
+        SESSION.close()
+    print(f"\nDone! Generated {count} FAQs.")
 
 
 if __name__ == "__main__":
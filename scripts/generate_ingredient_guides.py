@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 """Generate educational ingredient guide content and push to Sanity CMS."""
 
+import asyncio
 import os
 import sys
-import time
-from datetime import datetime
+from functools import lru_cache
 
-import requests
 from dotenv import load_dotenv
-from openai import OpenAI
 from slugify import slugify
 
 from markdown_to_portable_text import markdown_to_portable_text
+from llm_cache import cached_complete
+from prompt_common import MARKDOWN_FORMATTING, prompt_fingerprint
+from openai_batch import finish_batch, run_batch
+from checkpoint import PushCheckpoint
+from retry_policy import make_openai_client, make_sanity_session, sanity_post
+from sanity_lookup import PUBLISHED_AT
 
 load_dotenv()
-client = OpenAI()
+client = make_openai_client()
+
+# Guides generated at once — keeps us under the OpenAI rate limit
+MAX_CONCURRENCY = 5
 
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
 SANITY_DATASET = os.getenv("SANITY_DATASET", "production")
@@ -25,6 +32,8 @@ SANITY_HEADERS = {
     "Authorization": f"Bearer {SANITY_TOKEN}",
 }
 
+SESSION = make_sanity_session(SANITY_HEADERS)
+
 INGREDIENTS = [
     {"name": "Diclofenac", "scientific": "Diclofenac sodium", "category": "NSAID", "origin": "Synthetic"},
     {"name": "Menthol", "scientific": "L-Menthol", "category": "Counter-irritant", "origin": "Derived from mint (Mentha)"},
@@ -43,35 +52,45 @@ INGREDIENTS = [
 ]
 
 
-def generate_ingredient_prompt(ingredient):
-    return f"""You are a medical science writer creating an educational guide about an active ingredient used in topical pain relief products. Write for a general audience with medical accuracy.
+SYSTEM_PROMPT = """You are a medical science writer creating an educational guide about an active ingredient used in topical pain relief products. Write for a general audience with medical accuracy.
 
-Ingredient: {ingredient['name']}
-Scientific Name: {ingredient['scientific']}
-Category: {ingredient['category']}
-Origin: {ingredient['origin']}
+The user message gives the ingredient, its scientific name, category, origin, and the article title.
 
 Write a comprehensive ingredient guide with:
 
-1. **Title**: "{ingredient['name']} for Pain Relief: What You Need to Know"
+1. **Title**: Use the article title given in the user message
 2. **Overview** (150 words): What it is, where it comes from, how it's used in topical treatments
 3. **How It Works**: Scientific mechanism of action explained in plain language. Cite relevant research (PubMed, clinical trials).
 4. **Evidence & Research**: Key clinical studies, FDA status, level of scientific support
-5. **Common Products Containing {ingredient['name']}**: Types of products that use this ingredient
+5. **Common Products Containing the Ingredient**: Types of products that use this ingredient
 6. **Benefits**: 4-6 specific benefits for pain relief
 7. **Side Effects & Precautions**: Known side effects, who should avoid it, drug interactions
-8. **How to Use Products With {ingredient['name']}**: Application tips, dosing guidance
+8. **How to Use Products With the Ingredient**: Application tips, dosing guidance
 9. **Comparison to Other Ingredients**: How it compares to alternatives in the same category
 10. **FAQ**: 3-4 common questions
 
 Be evidence-based and cite medical sources. Include E-E-A-T signals. Avoid health claims that aren't supported by evidence.
 
-FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, - for bullet lists, 1. for numbered lists, **bold** for emphasis."""
+""" + MARKDOWN_FORMATTING
+
+
+def generate_ingredient_prompt(ingredient):
+    """Build the per-ingredient user message; the shared instructions live in SYSTEM_PROMPT."""
+    return f"""Ingredient: {ingredient['name']}
+Scientific Name: {ingredient['scientific']}
+Category: {ingredient['category']}
+Origin: {ingredient['origin']}
+Article title: "{ingredient['name']} for Pain Relief: What You Need to Know\""""
+
+
+@lru_cache(maxsize=None)
+def ingredient_slug(name):
+    return slugify(name)
 
 
 def push_ingredient_to_sanity(ingredient, content, prompt):
     title = f"{ingredient['name']} for Pain Relief: What You Need to Know"
-    slug = slugify(ingredient["name"])
+    slug = ingredient_slug(ingredient["name"])
 
     lines = [l.strip() for l in content.splitlines() if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 20]
     excerpt = lines[0][:300] if lines else f"Learn about {ingredient['name']} and how it works for topical pain relief."
@@ -84,7 +103,7 @@ def push_ingredient_to_sanity(ingredient, content, prompt):
                     "_id": f"ingredient-{slug}",
                     "title": ingredient["name"],
                     "slug": {"_type": "slug", "current": slug},
-                    "publishedAt": datetime.utcnow().isoformat() + "Z",
+                    "publishedAt": PUBLISHED_AT,
                     "excerpt": excerpt,
                     "scientificName": ingredient["scientific"],
                     "origin": ingredient["origin"],
@@ -97,30 +116,101 @@ def push_ingredient_to_sanity(ingredient, content, prompt):
         ]
     }
 
-    response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=doc)
+    response = sanity_post(SANITY_URL, session=SESSION, json=doc, timeout=30)
     if response.status_code == 200:
         print(f"  Published: {title}")
-    else:
-        print(f"  Failed: {response.text[:200]}")
+        return True
+    print(f"  Failed: {response.text[:200]}")
+    return False
 
 
-def main():
-    max_count = int(sys.argv[1]) if len(sys.argv) > 1 else len(INGREDIENTS)
-
-    for i, ingredient in enumerate(INGREDIENTS[:max_count]):
-        print(f"\n[{i+1}/{max_count}] Generating guide for: {ingredient['name']}")
-        try:
+async def generate_guide(ingredient, sem, label, checkpoint):
+    try:
+        async with sem:
+            print(f"\n{label} Generating guide for: {ingredient['name']}")
             prompt = generate_ingredient_prompt(ingredient)
-            response = client.chat.completions.create(
-                model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.7
+            content = await cached_complete(
+                client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
             )
-            content = response.choices[0].message.content
-            push_ingredient_to_sanity(ingredient, content, prompt)
-            time.sleep(2)
+        # Only the OpenAI call holds a slot — the next generation starts while this
+        # (blocking) Sanity push runs off the event loop
+        if await asyncio.to_thread(push_ingredient_to_sanity, ingredient, content, prompt):
+            checkpoint.record(ingredient_slug(ingredient["name"]))
+    except Exception as e:
+        print(f"  Error ({ingredient['name']}): {e}")
+
+
+async def generate_guides_batch(ingredients, checkpoint):
+    """Generate all guides through the Batch API (~50% cheaper, up to 24h), then publish them"""
+    prompts = {f"ingredient-{ingredient_slug(ing['name'])}": generate_ingredient_prompt(ing) for ing in ingredients}
+    results = await run_batch(client, "ingredient_guides", {
+        custom_id: {
+            "model": "gpt-4o",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.7,
+        }
+        for custom_id, prompt in prompts.items()
+    })
+
+    async def publish(ingredient):
+        custom_id = f"ingredient-{ingredient_slug(ingredient['name'])}"
+        if custom_id not in results:
+            print(f"  No batch result for: {ingredient['name']}")
+            return
+        try:
+            if await asyncio.to_thread(push_ingredient_to_sanity, ingredient, results[custom_id], prompts[custom_id]):
+                checkpoint.record(ingredient_slug(ingredient["name"]))
         except Exception as e:
-            print(f"  Error: {e}")
-
-    print(f"\nDone! Generated {min(max_count, len(INGREDIENTS))} ingredient guides.")
+            print(f"  Error ({ingredient['name']}): {e}")
+
+    await asyncio.gather(*[publish(ing) for ing in ingredients])
+    finish_batch("ingredient_guides")
+
+
+async def main_async(max_count, force=False, batch=False):
+    print(f"System prompt {prompt_fingerprint(SYSTEM_PROMPT)} ({len(SYSTEM_PROMPT)} chars)")
+    # Checkpoint rather than a Sanity _id lookup: seed_ingredients creates the
+    # same ingredient-{slug} documents as stubs, which still need a guide
+    checkpoint = PushCheckpoint("ingredient_guides")
+    ingredients = INGREDIENTS
+    if not force:
+        ingredients = [ing for ing in INGREDIENTS if ingredient_slug(ing["name"]) not in checkpoint]
+        if len(ingredients) < len(INGREDIENTS):
+            print(f"⏩ Skipping {len(INGREDIENTS) - len(ingredients)} guides published by an earlier run (use --force to regenerate)")
+    ingredients = ingredients[:max_count]
+
+    if batch:
+        await generate_guides_batch(ingredients, checkpoint)
+        return len(ingredients)
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    await asyncio.gather(*[
+        generate_guide(ingredient, sem, f"[{i+1}/{len(ingredients)}]", checkpoint)
+        for i, ingredient in enumerate(ingredients)
+    ])
+    return len(ingredients)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    force = "--force" in argv
+    batch = "--batch" in argv
+    argv = [a for a in argv if a not in ("--force", "--batch")]
+    max_count = int(argv[0]) if argv else len(INGREDIENTS)
+    try:
+        count = asyncio.run(main_async(max_count, force, batch))
+    finally:
+        SESSION.close()
+    print(f"\nDone! Generated {count} ingredient guides.")
 
 
 if __name__ == "__main__":
@@ -1,21 +1,36 @@
 #!/usr/bin/env python3
 """Generate single-product deep-dive review blog posts and push to Sanity CMS."""
 
+import asyncio
 import json
+from collections import defaultdict
 import os
+import re
 import sys
-import time
-from datetime import datetime
 
 import requests
 from dotenv import load_dotenv
-from openai import OpenAI
 from slugify import slugify
 
+try:
+    import orjson
+except ImportError:  # Optional speedup — stdlib json is used as a fallback
+    orjson = None
+
 from markdown_to_portable_text import markdown_to_portable_text
+from llm_cache import cached_complete
+from prompt_common import MARKDOWN_FORMATTING, prompt_fingerprint
+from checkpoint import PushCheckpoint
+from retry_policy import make_openai_client, make_sanity_session, sanity_post
+from sanity_lookup import PUBLISHED_AT
 
 load_dotenv()
-client = OpenAI()
+client = make_openai_client()
+
+# Reviews generated at once — keeps us under the OpenAI rate limit
+MAX_CONCURRENCY = 5
+# Reviews published per Sanity transaction
+REVIEW_BATCH_SIZE = 10
 
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
 SANITY_DATASET = os.getenv("SANITY_DATASET", "production")
@@ -26,32 +41,49 @@ SANITY_HEADERS = {
     "Authorization": f"Bearer {SANITY_TOKEN}",
 }
 
+SESSION = make_sanity_session(SANITY_HEADERS)
+
+# python-slugify's rules for plain ASCII: commas inside numbers drop ("1,000"),
+# every other run of non-alphanumerics becomes one dash
+_NUMBER_COMMA_RE = re.compile(r"(?<=\d),(?=\d)")
+_NON_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _slug(text):
+    """slugify() without its unicode/HTML-entity normalization when the input doesn't need it.
+
+    Must produce exactly what slugify() does — product slugs are Sanity IDs.
+    """
+    if not text.isascii() or "&" in text:
+        return slugify(text)
+    return _NON_SLUG_RE.sub("-", _NUMBER_COMMA_RE.sub("", text.lower())).strip("-")
+
+
 
 def load_products():
-    with open("data/affiliate_products.json") as f:
-        data = json.load(f)
-    return data["products"]
+    """Reviewable (non-Rx) products, plus the same list indexed by category"""
+    if orjson is not None:
+        with open("data/affiliate_products.json", "rb") as f:
+            data = orjson.loads(f.read())
+    else:
+        with open("data/affiliate_products.json") as f:
+            data = json.load(f)
+    products = [p for p in data["products"] if p.get("otc_rx") != "Rx"]
+    by_category = defaultdict(list)
+    for p in products:
+        by_category[p.get("category")].append(p)
+    return products, by_category
 
 
-def generate_review_prompt(product):
-    return f"""You are a professional medical writer creating an in-depth product review for a topical pain relief product. Write in a clear, evidence-based tone similar to Healthline or Verywell Health.
+SYSTEM_PROMPT = """You are a professional medical writer creating an in-depth product review for a topical pain relief product. Write in a clear, evidence-based tone similar to Healthline or Verywell Health.
 
-Product: {product['product_name']}
-Brand: {product['brand']}
-Type: {product.get('type', 'cream')}
-Active Ingredient: {product.get('active_ingredient', 'N/A')}
-Category: {product.get('category', 'general')}
-Price Range: {product.get('price_range', 'N/A')}
-Size: {product.get('size_g', 'N/A')}g
-OTC/Rx: {product.get('otc_rx', 'OTC')}
-Mechanism: {product.get('mechanism', 'N/A')}
-Notes: {product.get('notes', '')}
+The user message gives the product details.
 
 Write a comprehensive review with the following structure:
 
-1. **Title** - SEO-optimized review title (e.g., "{product['product_name']} Review: Does It Really Work?")
+1. **Title** - SEO-optimized review title (e.g., "[Product] Review: Does It Really Work?")
 2. **Summary** - 2-3 sentence overview with a rating out of 5
-3. **What Is {product['product_name']}?** - Product overview, what it treats, how it works
+3. **What Is [Product]?** - Product overview, what it treats, how it works
 4. **Key Ingredients & How They Work** - Scientific explanation of active ingredients. Cite medical sources (Mayo Clinic, PubMed, Arthritis Foundation) where relevant.
 5. **How to Use It** - Application instructions, frequency, tips
 6. **Who Should Use This Product** - Target conditions, ideal user profile
@@ -66,28 +98,51 @@ Write a comprehensive review with the following structure:
 
 Include E-E-A-T signals: cite specific studies or medical guidelines where possible. Use short, scannable paragraphs. Do NOT copy any content from other sites.
 
-FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, - for bullet lists, 1. for numbered lists, **bold** for emphasis."""
+""" + MARKDOWN_FORMATTING
 
 
-def extract_title(content):
-    for line in content.splitlines():
-        cleaned = line.strip().strip("#").strip()
-        if cleaned and len(cleaned) > 10:
-            cleaned = cleaned.replace("**", "").replace("1.", "").strip()
-            if "title" not in cleaned.lower():
-                return cleaned
-            title_part = cleaned.split(":", 1)
-            if len(title_part) > 1:
-                return title_part[1].strip().strip('"')
+def generate_review_prompt(product):
+    """Build the per-product user message; the shared instructions live in SYSTEM_PROMPT."""
+    return f"""Product: {product['product_name']}
+Brand: {product['brand']}
+Type: {product.get('type', 'cream')}
+Active Ingredient: {product.get('active_ingredient', 'N/A')}
+Category: {product.get('category', 'general')}
+Price Range: {product.get('price_range', 'N/A')}
+Size: {product.get('size_g', 'N/A')}g
+OTC/Rx: {product.get('otc_rx', 'OTC')}
+Mechanism: {product.get('mechanism', 'N/A')}
+Notes: {product.get('notes', '')}"""
+
+
+def _title_from_line(stripped):
+    """Title candidate from one line, or None (skips short lines and bare "Title" labels)"""
+    cleaned = stripped.strip("#").strip()
+    if len(cleaned) <= 10:
+        return None
+    cleaned = cleaned.replace("**", "").replace("1.", "").strip()
+    if "title" not in cleaned.lower():
+        return cleaned
+    title_part = cleaned.split(":", 1)
+    if len(title_part) > 1:
+        return title_part[1].strip().strip('"')
     return None
 
 
-def extract_rating(content):
-    import re
+# "4.5/5", "Rating: 4.5", "4.5 out of 5" — tried in order
+_RATING_PATTERNS = [
+    re.compile(r"(\d\.?\d?)\s*/\s*5"),
+    re.compile(r"rating[:\s]+(\d\.?\d?)"),
+    re.compile(r"(\d\.?\d?)\s*out of\s*5"),
+]
 
-    patterns = [r"(\d\.?\d?)\s*/\s*5", r"rating[:\s]+(\d\.?\d?)", r"(\d\.?\d?)\s*out of\s*5"]
-    for pattern in patterns:
-        match = re.search(pattern, content.lower())
+
+def extract_rating(content):
+    # Searched over the whole text, not per line: "Rating:" and its number
+    # may sit on separate lines
+    lower = content.lower()
+    for pattern in _RATING_PATTERNS:
+        match = pattern.search(lower)
         if match:
             try:
                 return min(float(match.group(1)), 5.0)
@@ -96,102 +151,194 @@ def extract_rating(content):
     return 4.0
 
 
-def extract_pros_cons(content):
+def parse_review(content):
+    """Pull title, rating, pros/cons and excerpt out of a generated review in one pass over its lines"""
+    title = excerpt = None
     pros, cons = [], []
     in_pros, in_cons = False, False
     for line in content.splitlines():
-        lower = line.strip().lower()
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if title is None:
+            title = _title_from_line(stripped)
+        if excerpt is None and len(stripped) > 30 and not stripped.startswith("#"):
+            excerpt = stripped[:300]
+
+        lower = stripped.lower()
         if "**pros**" in lower or "## pros" in lower or "### pros" in lower:
             in_pros, in_cons = True, False
             continue
         elif "**cons**" in lower or "## cons" in lower or "### cons" in lower:
             in_pros, in_cons = False, True
             continue
-        elif line.strip().startswith(("##", "**")) and ("pros" not in lower and "cons" not in lower):
+        elif stripped.startswith(("##", "**")) and ("pros" not in lower and "cons" not in lower):
             in_pros, in_cons = False, False
             continue
 
-        bullet = line.strip().lstrip("-*•").strip()
-        if bullet and len(bullet) > 5:
+        bullet = stripped.lstrip("-*•").strip()
+        if len(bullet) > 5:
             if in_pros:
                 pros.append(bullet)
             elif in_cons:
                 cons.append(bullet)
-    return pros[:6], cons[:5]
-
-
-def push_review_to_sanity(product, content, prompt):
-    title = extract_title(content) or f"{product['product_name']} Review"
-    slug = slugify(title)
-    rating = extract_rating(content)
-    pros, cons = extract_pros_cons(content)
-    product_id = f"product-{slugify(product['product_name'])}"
-    excerpt_lines = [
-        l.strip()
-        for l in content.splitlines()
-        if l.strip() and not l.strip().startswith("#") and len(l.strip()) > 30
-    ]
-    excerpt = excerpt_lines[0][:300] if excerpt_lines else f"A comprehensive review of {product['product_name']}."
-
-    doc = {
-        "mutations": [
-            {
-                "createOrReplace": {
-                    "_type": "review",
-                    "_id": f"review-{slug}",
-                    "title": title,
-                    "slug": {"_type": "slug", "current": slug},
-                    "publishedAt": datetime.utcnow().isoformat() + "Z",
-                    "excerpt": excerpt,
-                    "rating": rating,
-                    "product": {"_type": "reference", "_ref": product_id},
-                    "pros": pros,
-                    "cons": cons,
-                    "content": markdown_to_portable_text(content),
-                    "generatedContent": content,
-                    "sourcePrompt": prompt[:500],
-                    "sourceModel": "gpt-4o",
-                }
-            }
-        ]
+    return {
+        "title": title,
+        "rating": extract_rating(content),
+        "pros": pros[:6],
+        "cons": cons[:5],
+        "excerpt": excerpt,
     }
 
-    response = requests.post(SANITY_URL, headers=SANITY_HEADERS, json=doc)
-    if response.status_code == 200:
-        print(f"  Published review: {title}")
-    else:
-        print(f"  Failed: {response.text[:200]}")
-
 
-def main():
-    products = load_products()
-    category_filter = sys.argv[1] if len(sys.argv) > 1 else None
-    max_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+def build_review_mutation(product, content, prompt):
+    parsed = parse_review(content)
+    title = parsed["title"] or f"{product['product_name']} Review"
+    slug = _slug(title)
+    product_id = f"product-{_slug(product['product_name'])}"
+    excerpt = parsed["excerpt"] or f"A comprehensive review of {product['product_name']}."
+
+    return {
+        "createOrReplace": {
+            "_type": "review",
+            "_id": f"review-{slug}",
+            "title": title,
+            "slug": {"_type": "slug", "current": slug},
+            "publishedAt": PUBLISHED_AT,
+            "excerpt": excerpt,
+            "rating": parsed["rating"],
+            "product": {"_type": "reference", "_ref": product_id},
+            "pros": parsed["pros"],
+            "cons": parsed["cons"],
+            "content": markdown_to_portable_text(content),
+            "generatedContent": content,
+            "sourcePrompt": prompt[:500],
+            "sourceModel": "gpt-4o",
+        }
+    }
 
-    if category_filter:
-        products = [p for p in products if p.get("category") == category_filter]
-        print(f"Filtered to {len(products)} products in category: {category_filter}")
 
-    count = 0
-    for product in products:
-        if count >= max_count:
-            break
-        if product.get("otc_rx") == "Rx":
-            continue
-
-        print(f"\n[{count+1}/{max_count}] Generating review for: {product['product_name']}")
-        try:
+def push_reviews_to_sanity(items):
+    """
+    Publish (product, mutation) pairs in one transaction
+
+    A transaction is all-or-nothing, so if Sanity rejects the batch (4xx) each
+    review is retried on its own to isolate the bad document.
+
+    Returns:
+        The products whose review was published
+    """
+    body = {"mutations": [m for _, m in items]}
+    # Batches carry full articles twice (markdown + Portable Text); orjson encodes
+    # straight to bytes. The session already sends Content-Type: application/json.
+    payload = {"data": orjson.dumps(body)} if orjson is not None else {"json": body}
+    try:
+        response = sanity_post(SANITY_URL, session=SESSION, timeout=60, **payload)
+    except requests.RequestException as e:
+        # Retries exhausted on a connection error — report it like a failed response
+        print(f"  Failed to publish {len(items)} review(s): {e}")
+        return []
+    if response.status_code == 200:
+        for _, m in items:
+            print(f"  Published review: {m['createOrReplace']['title']}")
+        return [product for product, _ in items]
+    if len(items) > 1 and 400 <= response.status_code < 500:
+        print(f"  Batch of {len(items)} rejected, publishing one at a time: {response.text[:200]}")
+        return [product for item in items for product in push_reviews_to_sanity([item])]
+    print(f"  Failed: {response.text[:200]}")
+    return []
+
+
+class _ReviewBatch:
+    """Collects finished reviews and publishes them REVIEW_BATCH_SIZE at a time"""
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.pending = []
+
+    async def add(self, product, mutation):
+        self.pending.append((product, mutation))
+        if len(self.pending) >= REVIEW_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        # Swap the buffer out before awaiting so reviews finishing meanwhile start a new batch
+        items, self.pending = self.pending, []
+        if not items:
+            return
+        # Blocking request — run it off the event loop
+        for product in await asyncio.to_thread(push_reviews_to_sanity, items):
+            self.checkpoint.record(_slug(product["product_name"]))
+
+
+async def generate_review(product, sem, label, batch):
+    try:
+        async with sem:
+            print(f"\n{label} Generating review for: {product['product_name']}")
             prompt = generate_review_prompt(product)
-            response = client.chat.completions.create(
-                model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.7
+            content = await cached_complete(
+                client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
             )
-            content = response.choices[0].message.content
-            push_review_to_sanity(product, content, prompt)
-            count += 1
-            time.sleep(2)
-        except Exception as e:
-            print(f"  Error: {e}")
+        # Portable Text conversion is CPU work — keep it off the event loop too
+        mutation = await asyncio.to_thread(build_review_mutation, product, content, prompt)
+        await batch.add(product, mutation)
+        return True
+    except Exception as e:
+        print(f"  Error ({product['product_name']}): {e}")
+        return False
+
+
+async def main_async(products, max_count, force=False):
+    print(f"System prompt {prompt_fingerprint(SYSTEM_PROMPT)} ({len(SYSTEM_PROMPT)} chars)")
+
+    # Review IDs come from the generated title, so an earlier run's progress is
+    # tracked locally by product instead of queried from Sanity
+    checkpoint = PushCheckpoint("review_blogs")
+    if not force:
+        remaining = [p for p in products if _slug(p["product_name"]) not in checkpoint]
+        if len(remaining) < len(products):
+            print(f"⏩ Skipping {len(products) - len(remaining)} products reviewed by an earlier run (use --force to regenerate)")
+        products = remaining
+    pending = products[:max_count]
+
+    # Pacing comes from the shared OpenAI rate limiter (see rate_limiter), not fixed sleeps
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    batch = _ReviewBatch(checkpoint)
+    results = await asyncio.gather(*[
+        generate_review(product, sem, f"[{i+1}/{len(pending)}]", batch)
+        for i, product in enumerate(pending)
+    ])
+    await batch.flush()
+    return sum(results)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    force = "--force" in argv
+    argv = [a for a in argv if a != "--force"]
+    # [category] [max] — a lone number is the max (how generate_all calls it)
+    if len(argv) == 1 and argv[0].isdigit():
+        argv = [None, argv[0]]
+    products, by_category = load_products()
+    category_filter = argv[0] if len(argv) > 0 else None
+    max_count = int(argv[1]) if len(argv) > 1 else 10
+
+    if category_filter:
+        products = by_category.get(category_filter, [])
+        print(f"Filtered to {len(products)} products in category: {category_filter}")
 
+    try:
+        count = asyncio.run(main_async(products, max_count, force))
+    finally:
+        # Release the pooled keep-alive connections — under generate_all every
+        # step runs in one process, so they would otherwise linger until exit
+        SESSION.close()
     print(f"\nDone! Generated {count} reviews.")
 
 
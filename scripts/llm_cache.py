@@ -0,0 +1,91 @@
+"""
+On-disk cache of OpenAI completions for the content generation scripts.
+
+Completions are stored content-addressed under .cache/llm/, keyed by a hash of
+model, temperature and the exact messages, so re-running a script with an
+unchanged prompt reads the previous answer from disk instead of paying for a
+new one. Opt-in with LLM_CACHE=1 — at temperature 0.7 a cache hit returns the
+earlier sample rather than a fresh one, which is what you want while iterating
+on the publishing side but not for production content runs.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from retry_policy import create_chat_completion
+
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", ".cache/llm"))
+ENABLED = os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def _cache_path(model: str, temperature: float, messages: List[Dict], response_format: Optional[Dict]) -> Path:
+    key_fields = {"model": model, "temperature": temperature, "messages": messages}
+    if response_format is not None:
+        # Only keyed when set, so plain-text entries written before it existed still hit
+        key_fields["response_format"] = response_format
+    payload = json.dumps(key_fields, sort_keys=True, ensure_ascii=False)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return CACHE_DIR / key[:2] / f"{key}.txt"
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Write via temp file + os.replace so a crash never leaves a partial entry"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+async def cached_complete(
+    client,
+    model: str,
+    messages: List[Dict],
+    temperature: float,
+    response_format: Optional[Dict] = None,
+) -> str:
+    """
+    Chat completion text, served from the disk cache when enabled
+
+    Args:
+        client: AsyncOpenAI client
+        model: Model name
+        messages: Chat messages (part of the cache key)
+        temperature: Sampling temperature (part of the cache key)
+        response_format: Optional structured-output format (part of the cache key)
+
+    Returns:
+        The completion's message content
+    """
+    path = _cache_path(model, temperature, messages, response_format) if ENABLED else None
+    if path is not None:
+        # Disk I/O goes through a worker thread so a slow or network-mounted
+        # cache dir doesn't stall every other in-flight generation
+        cached = await asyncio.to_thread(_read, path)
+        if cached is not None:
+            return cached
+
+    kwargs = {"response_format": response_format} if response_format is not None else {}
+    response = await create_chat_completion(
+        client, model=model, messages=messages, temperature=temperature, **kwargs
+    )
+    content = response.choices[0].message.content
+    if path is not None and content:
+        await asyncio.to_thread(_write_atomic, path, content)
+    return content
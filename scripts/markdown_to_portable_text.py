@@ -5,13 +5,77 @@ Pure Python, regex-based. No external dependencies.
 Handles: headings, bold, italic, links, bullet/numbered lists, blockquotes.
 """
 
+import random
 import re
-import uuid
+
+# Emphasis runs tried longest first: ***bold-italic***, **bold**, *italic*
+_EMPHASIS = (("***", ["strong", "em"]), ("**", ["strong"]), ("*", ["em"]))
+_WRAPPED_LINK_RE = re.compile(r'^\[([^\]]+)\]\(([^)]+)\)(.*)$')
+
+# Block-level line patterns
+_HEADING_RE = re.compile(r'^(#{1,4})\s+(.+)$')
+_TRAILING_HASHES_RE = re.compile(r'\s*#+\s*$')
+_BLOCKQUOTE_RE = re.compile(r'^>\s*(.*)$')
+_BULLET_RE = re.compile(r'^(\s*)([-*])\s+(.+)$')
+_NUMBERED_RE = re.compile(r'^(\s*)\d+\.\s+(.+)$')
+_HR_RE = re.compile(r'^[\s]*[-*_]{3,}\s*$')
+_PSEUDO_HEADER_RE = re.compile(r'^\*\*([^*]+)\*\*:?\s*$')
 
 
 def _generate_key(prefix="k"):
     """Generate a short unique key for Sanity blocks/spans."""
-    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+    # 8 random hex chars. Keys only need to be unique within a document, not
+    # unguessable, so the Mersenne Twister beats a urandom syscall per span —
+    # and unlike a shared pre-generated pool it is safe to call from the
+    # worker threads the generators convert in.
+    return f"{prefix}-{random.getrandbits(32):08x}"
+
+
+def _tokenize_inline(text):
+    """Yield (start, end, inner_text, url, marks) for each inline token, left to right.
+
+    Tokens are [text](url) links (marks None) and emphasis runs. At each
+    position a link is tried first, then ***, ** and *; emphasis needs at least
+    one character inside and can't span a newline. Single linear scan with
+    str.find — an unclosed asterisk costs one search to end of line instead of
+    regex backtracking.
+    """
+    n = len(text)
+    i = 0
+    bracket = text.find("[")
+    while True:
+        # Only '[' and '*' can start a token — jump straight to the next one
+        # (the next '[' is only searched again once the scan has passed it)
+        if bracket != -1 and bracket < i:
+            bracket = text.find("[", i)
+        star = text.find("*", i)
+        if bracket == -1 and star == -1:
+            return
+        i = bracket if star == -1 or (bracket != -1 and bracket < star) else star
+
+        if text[i] == "[":
+            close = text.find("]", i + 1)
+            if close > i + 1 and text.startswith("(", close + 1):
+                paren = text.find(")", close + 2)
+                if paren > close + 2:
+                    yield i, paren + 1, text[i + 1:close], text[close + 2:paren], None
+                    i = paren + 1
+                    continue
+            i += 1
+            continue
+
+        eol = text.find("\n", i)
+        if eol == -1:
+            eol = n
+        for delim, marks in _EMPHASIS:
+            if text.startswith(delim, i):
+                close = text.find(delim, i + len(delim) + 1, eol)
+                if close != -1:
+                    yield i, close + len(delim), text[i + len(delim):close], None, marks
+                    i = close + len(delim)
+                    break
+        else:
+            i += 1
 
 
 def _parse_inline(text):
@@ -23,117 +87,63 @@ def _parse_inline(text):
     mark_defs = []
 
     # Tokenize: split text into segments of plain, bold, italic, bold-italic, links
-    # Pattern matches: [text](url), ***bold-italic***, **bold**, *italic*
-    pattern = re.compile(
-        r'(\[([^\]]+)\]\(([^)]+)\))'   # [text](url)
-        r'|(\*\*\*(.+?)\*\*\*)'        # ***bold italic***
-        r'|(\*\*(.+?)\*\*)'            # **bold**
-        r'|(\*(.+?)\*)'                # *italic*
-    )
-
     last_end = 0
-    for match in pattern.finditer(text):
-        start = match.start()
-
-        # Add plain text before this match
+    for start, end, inner, url, marks in _tokenize_inline(text):
+        # Add plain text before this token
         if start > last_end:
-            plain = text[last_end:start]
-            if plain:
-                spans.append({
-                    "_type": "span",
-                    "_key": _generate_key("s"),
-                    "text": plain,
-                    "marks": [],
-                })
+            spans.append({
+                "_type": "span",
+                "_key": _generate_key("s"),
+                "text": text[last_end:start],
+                "marks": [],
+            })
 
-        if match.group(1):  # Link: [text](url)
-            link_text = match.group(2)
-            link_url = match.group(3)
+        if marks is None:  # Link: [text](url)
             link_key = _generate_key("ln")
             mark_defs.append({
                 "_type": "link",
                 "_key": link_key,
-                "href": link_url,
+                "href": url,
             })
             spans.append({
                 "_type": "span",
                 "_key": _generate_key("s"),
-                "text": link_text,
+                "text": inner,
                 "marks": [link_key],
             })
-        elif match.group(4):  # Bold italic: ***text***
-            spans.append({
-                "_type": "span",
-                "_key": _generate_key("s"),
-                "text": match.group(5),
-                "marks": ["strong", "em"],
-            })
-        elif match.group(6):  # Bold: **text**
-            inner = match.group(7)
-            # Check if the bold text contains a link like **[text](url)**
-            link_in_bold = re.match(r'^\[([^\]]+)\]\(([^)]+)\)(.*)$', inner)
-            if link_in_bold:
+        else:
+            # Bold or italic wrapping a link, like **[text](url)** (not bold-italic)
+            wrapped = _WRAPPED_LINK_RE.match(inner) if len(marks) == 1 else None
+            if wrapped:
                 link_key = _generate_key("ln")
                 mark_defs.append({
                     "_type": "link",
                     "_key": link_key,
-                    "href": link_in_bold.group(2),
+                    "href": wrapped.group(2),
                 })
                 spans.append({
                     "_type": "span",
                     "_key": _generate_key("s"),
-                    "text": link_in_bold.group(1),
-                    "marks": ["strong", link_key],
+                    "text": wrapped.group(1),
+                    "marks": marks + [link_key],
                 })
-                trailing = link_in_bold.group(3)
+                trailing = wrapped.group(3)
                 if trailing:
                     spans.append({
                         "_type": "span",
                         "_key": _generate_key("s"),
                         "text": trailing,
-                        "marks": ["strong"],
+                        "marks": list(marks),
                     })
             else:
                 spans.append({
                     "_type": "span",
                     "_key": _generate_key("s"),
                     "text": inner,
-                    "marks": ["strong"],
-                })
-        elif match.group(8):  # Italic: *text*
-            inner_it = match.group(9)
-            # Check if italic text contains a link like *[text](url)*
-            link_in_italic = re.match(r'^\[([^\]]+)\]\(([^)]+)\)(.*)$', inner_it)
-            if link_in_italic:
-                link_key = _generate_key("ln")
-                mark_defs.append({
-                    "_type": "link",
-                    "_key": link_key,
-                    "href": link_in_italic.group(2),
-                })
-                spans.append({
-                    "_type": "span",
-                    "_key": _generate_key("s"),
-                    "text": link_in_italic.group(1),
-                    "marks": ["em", link_key],
-                })
-                trailing = link_in_italic.group(3)
-                if trailing:
-                    spans.append({
-                        "_type": "span",
-                        "_key": _generate_key("s"),
-                        "text": trailing,
-                        "marks": ["em"],
-                    })
-            else:
-                spans.append({
-                    "_type": "span",
-                    "_key": _generate_key("s"),
-                    "text": inner_it,
-                    "marks": ["em"],
+                    "marks": list(marks),
                 })
 
-        last_end = match.end()
+        last_end = end
 
     # Remaining plain text
     if last_end < len(text):
@@ -211,34 +221,36 @@ def markdown_to_portable_text(markdown_str):
 
     for line in lines:
         stripped = line.rstrip()
+        # Indentation matters only for list nesting; everything else matches the bare text
+        bare = stripped.lstrip()
 
         # Empty line -> flush paragraph and table
-        if not stripped.strip():
+        if not bare:
             flush_table()
             flush_paragraph()
             continue
 
         # Headings: ## h2, ### h3, #### h4
-        heading_match = re.match(r'^(#{1,4})\s+(.+)$', stripped.strip())
+        heading_match = _HEADING_RE.match(bare)
         if heading_match:
             flush_paragraph()
             level = len(heading_match.group(1))
             heading_text = heading_match.group(2).strip()
             # Strip trailing # if present (e.g., ## Heading ##)
-            heading_text = re.sub(r'\s*#+\s*$', '', heading_text)
+            heading_text = _TRAILING_HASHES_RE.sub('', heading_text)
             style = f"h{level}" if level >= 2 else "h2"
             blocks.append(_make_block(style, heading_text))
             continue
 
         # Blockquote: > text
-        bq_match = re.match(r'^>\s*(.*)$', stripped.strip())
+        bq_match = _BLOCKQUOTE_RE.match(bare)
         if bq_match:
             flush_paragraph()
             blocks.append(_make_block("blockquote", bq_match.group(1).strip()))
             continue
 
         # Bullet list: - text or * text (check indentation for nesting)
-        bullet_match = re.match(r'^(\s*)([-*])\s+(.+)$', stripped)
+        bullet_match = _BULLET_RE.match(stripped)
         if bullet_match:
             flush_paragraph()
             indent = len(bullet_match.group(1))
@@ -247,7 +259,7 @@ def markdown_to_portable_text(markdown_str):
             continue
 
         # Numbered list: 1. text, 2. text, etc.
-        num_match = re.match(r'^(\s*)\d+\.\s+(.+)$', stripped)
+        num_match = _NUMBERED_RE.match(stripped)
         if num_match:
             flush_paragraph()
             indent = len(num_match.group(1))
@@ -257,9 +269,9 @@ def markdown_to_portable_text(markdown_str):
 
         # Table lines: accumulate consecutive rows into table_buffer,
         # then flush as a single block so the frontend renders an HTML table.
-        if stripped.strip().startswith("|"):
+        if bare.startswith("|"):
             flush_paragraph()
-            table_buffer.append(stripped.strip())
+            table_buffer.append(bare)
             continue
 
         # If we were accumulating table lines and hit a non-table line, flush the table
@@ -267,19 +279,19 @@ def markdown_to_portable_text(markdown_str):
             flush_table()
 
         # Horizontal rule: --- or *** or ___
-        if re.match(r'^[\s]*[-*_]{3,}\s*$', stripped):
+        if _HR_RE.match(stripped):
             flush_paragraph()
             continue
 
         # Pseudo-header: a line that is ONLY bold text ending with colon, e.g. **Something:**
-        pseudo_match = re.match(r'^\*\*([^*]+)\*\*:?\s*$', stripped.strip())
+        pseudo_match = _PSEUDO_HEADER_RE.match(bare)
         if pseudo_match:
             flush_paragraph()
             blocks.append(_make_block("h3", pseudo_match.group(1).strip()))
             continue
 
         # Regular text -> accumulate into paragraph
-        paragraph_buffer.append(stripped.strip())
+        paragraph_buffer.append(bare)
 
     # Flush any remaining buffers
     flush_table()
@@ -0,0 +1,134 @@
+"""
+OpenAI Batch API support for the content generation scripts.
+
+Bulk generation for the CMS isn't latency-sensitive: the Batch API bills at
+~50% of the synchronous price and has its own, much larger rate limits, at the
+cost of up to 24h turnaround. A run writes one JSONL request per item, submits
+it, and records the batch id under runs/batches/ so an interrupted run resumes
+polling the same batch instead of paying for a new one. The state is kept
+until the caller has published the results and calls finish_batch().
+"""
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict
+
+STATE_DIR = Path("runs/batches")
+POLL_INTERVAL = 30  # seconds between status checks
+TERMINAL_STATUSES = {"completed", "expired", "cancelled", "failed"}
+
+
+async def _submit(client, name: str, bodies: Dict[str, dict]) -> str:
+    """Upload the JSONL request file and create the batch; returns its id"""
+    input_path = STATE_DIR / f"{name}.jsonl"
+    with open(input_path, "w", encoding="utf-8") as f:
+        for custom_id, body in bodies.items():
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }, ensure_ascii=False) + "\n")
+
+    with open(input_path, "rb") as f:
+        batch_file = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"📦 Submitted batch {batch.id} ({len(bodies)} requests)")
+    return batch.id
+
+
+async def _wait(client, batch_id: str):
+    """Poll until the batch reaches a terminal status"""
+    while True:
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        counts = batch.request_counts
+        if counts:
+            print(f"  ⏳ Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done)")
+        else:
+            print(f"  ⏳ Batch {batch_id}: {batch.status}")
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def _download_results(client, batch) -> Dict[str, str]:
+    """Map custom_id -> completion content for every successful request in the output file"""
+    results = {}
+    failed = 0
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                failed += 1
+    if batch.request_counts:
+        failed = max(failed, batch.request_counts.failed)
+    if failed:
+        print(f"  ⚠️  {failed} batch request(s) failed")
+    return results
+
+
+def _bodies_hash(bodies: Dict[str, dict]) -> str:
+    """Digest of every request body, so a changed prompt or model never reuses a stale batch"""
+    payload = json.dumps(bodies, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def finish_batch(name: str) -> None:
+    """Drop the resume state for a job once its results have been published"""
+    (STATE_DIR / f"{name}.json").unlink(missing_ok=True)
+    (STATE_DIR / f"{name}.jsonl").unlink(missing_ok=True)
+
+
+async def run_batch(client, name: str, bodies: Dict[str, dict]) -> Dict[str, str]:
+    """
+    Submit chat completion requests as one batch (or resume the one in flight) and wait for it
+
+    Args:
+        client: AsyncOpenAI client
+        name: Stable job name (e.g. "faqs") — keys the resume state file
+        bodies: custom_id -> /v1/chat/completions request body
+
+    Returns:
+        custom_id -> completion content for every request that succeeded
+
+    The resume state survives this call; call finish_batch(name) after publishing
+    so a crash mid-publish re-downloads the same batch instead of paying again.
+    """
+    if not bodies:
+        return {}
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    state_path = STATE_DIR / f"{name}.json"
+
+    bodies_hash = _bodies_hash(bodies)
+    batch_id = None
+    if state_path.exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        # Only resume if it's the exact same requests — otherwise start over
+        if state.get("bodies_hash") == bodies_hash:
+            batch_id = state["batch_id"]
+            print(f"📦 Resuming batch {batch_id}")
+    if batch_id is None:
+        batch_id = await _submit(client, name, bodies)
+        state_path.write_text(
+            json.dumps({"batch_id": batch_id, "bodies_hash": bodies_hash}),
+            encoding="utf-8",
+        )
+
+    batch = await _wait(client, batch_id)
+    if batch.status != "completed" and not batch.output_file_id:
+        # Nothing to recover — the next run submits a fresh batch
+        finish_batch(name)
+        raise RuntimeError(f"Batch {batch_id} {batch.status} with no output")
+    return await _download_results(client, batch)
@@ -1,33 +1,57 @@
 """Shared LLM calling logic with multi-provider support (OpenAI, Anthropic, Google)."""
 
+import importlib.util
 import json
 import logging
+import random
 import time
-from pathlib import Path
-from typing import Any, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 from scripts.pipeline.config import (
     ANTHROPIC_API_KEY,
     GOOGLE_API_KEY,
+    LLM_CACHE_ENABLED,
     OPENAI_API_KEY,
     OPENAI_MODEL,
     OPENAI_TEMPERATURE,
     PROMPTS_DIR,
+    SEMANTIC_CACHE_MAX_TEMPERATURE,
+    SEMANTIC_CACHE_THRESHOLD,
 )
+from scripts.pipeline.utils import llm_cache
+
+try:
+    import orjson
+except ImportError:  # optional — falls back to stdlib json
+    orjson = None
 
 log = logging.getLogger(__name__)
 
 # ── Lazy-initialized clients ────────────────────────────────────────────────
+# One client per provider for the whole run, so agents share its connection
+# pool. Idle connections are kept for a minute (SDK default: 5s) to survive
+# the gaps between pipeline steps; HTTP/2 only if the optional h2 is installed.
+_HTTP2 = importlib.util.find_spec("h2") is not None
 _openai_client = None
 _anthropic_client = None
 _google_genai = None
 
 
+def _http_limits():
+    import httpx
+    return httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=60)
+
+
 def _get_openai():
     global _openai_client
     if _openai_client is None:
-        from openai import OpenAI
-        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        from openai import DefaultHttpxClient, OpenAI
+        _openai_client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=DefaultHttpxClient(limits=_http_limits(), http2=_HTTP2),
+        )
     return _openai_client
 
 
@@ -35,7 +59,10 @@ def _get_anthropic():
     global _anthropic_client
     if _anthropic_client is None:
         import anthropic
-        _anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+        _anthropic_client = anthropic.Anthropic(
+            api_key=ANTHROPIC_API_KEY,
+            http_client=anthropic.DefaultHttpxClient(limits=_http_limits(), http2=_HTTP2),
+        )
     return _anthropic_client
 
 
@@ -107,7 +134,7 @@ def _call_openai(
     raw = resp.choices[0].message.content or ""
     usage = resp.usage
     return {
-        "content": json.loads(raw) if json_mode else raw,
+        "content": _parse_json(raw) if json_mode else raw,
         "input_tokens": usage.prompt_tokens if usage else 0,
         "output_tokens": usage.completion_tokens if usage else 0,
     }
@@ -130,7 +157,10 @@ def _call_anthropic(
 
     kwargs: Dict[str, Any] = {
         "model": model,
-        "system": effective_system,
+        # Mark the system prompt as a cache breakpoint: repeat calls within ~5 min
+        # reuse it at a fraction of the input price. Prompts below the model's
+        # minimum cacheable length are simply not cached.
+        "system": [{"type": "text", "text": effective_system, "cache_control": {"type": "ephemeral"}}],
         "messages": [{"role": "user", "content": user_prompt}],
         "temperature": temperature,
         "max_tokens": max_tokens or 4096,
@@ -142,9 +172,15 @@ def _call_anthropic(
     if json_mode:
         raw = _strip_code_fences(raw)
 
+    cache_read = getattr(resp.usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(resp.usage, "cache_creation_input_tokens", None) or 0
+    if cache_read or cache_write:
+        log.debug("Anthropic prompt cache: %d read / %d written", cache_read, cache_write)
+
     return {
-        "content": json.loads(raw) if json_mode else raw,
-        "input_tokens": resp.usage.input_tokens,
+        "content": _parse_json(raw) if json_mode else raw,
+        # input_tokens excludes cached tokens — count them so usage totals stay comparable
+        "input_tokens": resp.usage.input_tokens + cache_read + cache_write,
         "output_tokens": resp.usage.output_tokens,
     }
 
@@ -180,12 +216,37 @@ def _call_google(
     input_tokens = resp.usage_metadata.prompt_token_count if resp.usage_metadata else 0
     output_tokens = resp.usage_metadata.candidates_token_count if resp.usage_metadata else 0
     return {
-        "content": json.loads(raw) if json_mode else raw,
+        "content": _parse_json(raw) if json_mode else raw,
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
     }
 
 
+def _parse_json(raw: str) -> Any:
+    """Parse a JSON response body; editor responses run to ~12k tokens, so prefer orjson.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so call_llm's
+    retry-on-bad-JSON handling covers both parsers.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _retry_delay(attempt: int, error: Optional[Exception]) -> float:
+    """Seconds to wait before retrying: the provider's Retry-After if it sent one, else capped backoff.
+
+    Jitter keeps concurrent pipeline runs that failed together from retrying together.
+    """
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        base = float(retry_after)
+    except (TypeError, ValueError):  # missing, or an HTTP-date
+        base = min(2 ** attempt, 30)
+    return base + random.uniform(0, 1)
+
+
 def _strip_code_fences(text: str) -> str:
     """Strip markdown code fences (```json ... ```) that some models wrap around JSON."""
     stripped = text.strip()
@@ -208,8 +269,9 @@ _PROVIDER_DISPATCH = {
 
 # ── Public API ──────────────────────────────────────────────────────────────
 
+@lru_cache(maxsize=None)  # one entry per file in prompts/
 def load_prompt(filename: str) -> str:
-    """Load a system prompt from the prompts/ directory."""
+    """Load a system prompt from the prompts/ directory (read once per process)."""
     path = PROMPTS_DIR / filename
     return path.read_text(encoding="utf-8").strip()
 
@@ -230,7 +292,10 @@ def call_llm(
                or "google/gemini-2.0-flash". Defaults to openai/gpt-4o.
 
     Returns {"content": str | dict, "input_tokens": int, "output_tokens": int}.
-    In json_mode the content value is a parsed dict.
+    In json_mode the content value is a parsed dict. With LLM_CACHE=1, a call
+    identical to an earlier one is served from disk and reports 0 tokens; with
+    SEMANTIC_CACHE_THRESHOLD set, so is a low-temperature call whose user
+    prompt is merely near-identical.
     """
     if model is None:
         model = f"openai/{OPENAI_MODEL}"
@@ -242,6 +307,27 @@ def call_llm(
 
     temp = temperature if temperature is not None else OPENAI_TEMPERATURE
 
+    key = None
+    if LLM_CACHE_ENABLED:
+        key = llm_cache.cache_key(provider, model_name, system_prompt, user_prompt, json_mode, temp, max_tokens)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            log.debug("LLM cache hit (%s/%s): %s", provider, model_name, key[:12])
+            return {"content": cached, "input_tokens": 0, "output_tokens": 0}
+
+    semantic = None
+    if SEMANTIC_CACHE_THRESHOLD is not None and temp <= SEMANTIC_CACHE_MAX_TEMPERATURE:
+        from scripts.pipeline.utils import semantic_cache
+        try:
+            scope = semantic_cache.scope_key(provider, model_name, system_prompt, json_mode, max_tokens)
+            vec = semantic_cache.embed(user_prompt)
+            cached = semantic_cache.lookup(scope, vec, SEMANTIC_CACHE_THRESHOLD)
+            if cached is not None:
+                return {"content": cached, "input_tokens": 0, "output_tokens": 0}
+            semantic = (scope, vec)
+        except Exception as e:
+            log.warning("Semantic cache unavailable, calling %s directly: %s", provider, e)
+
     last_error: Optional[Exception] = None
     for attempt in range(1, max_retries + 2):
         try:
@@ -258,7 +344,7 @@ def call_llm(
                 provider, model_name, attempt,
                 result["input_tokens"], result["output_tokens"],
             )
-            return result
+            break
 
         except json.JSONDecodeError as e:
             log.warning("JSON parse failed (%s, attempt %d): %s", provider, attempt, e)
@@ -268,6 +354,51 @@ def call_llm(
             last_error = e
 
         if attempt <= max_retries:
-            time.sleep(2 ** attempt)
+            time.sleep(_retry_delay(attempt, last_error))
+    else:
+        raise RuntimeError(f"LLM call failed after {max_retries + 1} attempts ({provider}/{model_name}): {last_error}")
 
-    raise RuntimeError(f"LLM call failed after {max_retries + 1} attempts ({provider}/{model_name}): {last_error}")
+    # Outside the retry loop: a failed cache write must not re-bill the call
+    if key is not None:
+        try:
+            llm_cache.put(key, result["content"])
+        except OSError as e:
+            log.warning("Could not write LLM cache entry %s: %s", key[:12], e)
+    if semantic is not None:
+        try:
+            semantic_cache.store(*semantic, result["content"])
+        except Exception as e:
+            log.warning("Could not store semantic cache entry: %s", e)
+    return result
+
+
+def call_llm_race(models: List[str], system_prompt: str, user_prompt: str, **kwargs) -> Dict[str, Any]:
+    """Send the same call to several models at once and return the first to succeed.
+
+    Each model goes through call_llm (with its own retries) on a worker thread.
+    Provider calls can't be cancelled mid-flight, so the slower ones still run
+    to completion in the background and are billed. Raises RuntimeError only if
+    every model fails. The result gains a "model" key naming the winner.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="llm-race")
+    futures = {
+        pool.submit(call_llm, system_prompt, user_prompt, model=m, **kwargs): m
+        for m in models
+    }
+    errors = []
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    log.warning("Race entrant %s failed: %s", futures[fut], e)
+                    errors.append(e)
+                    continue
+                log.debug("Race won by %s", futures[fut])
+                return {**result, "model": futures[fut]}
+    finally:
+        pool.shutdown(wait=False)
+    raise RuntimeError(f"All {len(models)} raced models failed: {errors}")
@@ -3,8 +3,8 @@
 import json
 import logging
 
-from scripts.pipeline.agents.base_agent import call_llm, load_prompt
-from scripts.pipeline.config import EDITOR_MODEL, PUBLISH_THRESHOLD
+from scripts.pipeline.agents.base_agent import call_llm, call_llm_race, load_prompt
+from scripts.pipeline.config import EDITOR_MODEL, EDITOR_RACE_MODELS, PUBLISH_THRESHOLD
 from scripts.pipeline.models import Article, ArticleOutline, EditResult, ResearchBrief
 
 log = logging.getLogger(__name__)
@@ -26,21 +26,9 @@ The format validator flagged these issues before your review. Factor these into
 {issues_str}
 """
 
-    user_prompt = f"""Review and score the following article.
-
-## Expected Outline Sections
-{json.dumps(sections_list)}
-
-## Article Metadata
-- Title: {outline['title']}
-- Content Type: {outline['content_type']}
-- Target Words: {outline['total_target_words']}
-- Actual Words: {article['word_count']}
-- SEO Keywords: {', '.join(brief['keywords'])}
-{validation_section}
-
-## Article Content
-{article['markdown']}
+    # Static instructions first, per-article data after, the article itself last —
+    # keeps the longest possible identical prefix for provider prompt caching
+    user_prompt = f"""Review and score the article given below.
 
 ## Task
 1. Score the article on 5 axes (each 0-20, total 0-100):
@@ -64,12 +52,30 @@ Return JSON with keys:
 - publish_decision: "publish" if score >= {PUBLISH_THRESHOLD}, else "draft"
 - score_breakdown: object with the 5 axes
 - issues_found: array of strings
-- corrections_made: array of strings (empty if no corrections)"""
+- corrections_made: array of strings (empty if no corrections)
+
+## Expected Outline Sections
+{json.dumps(sections_list)}
+
+## Article Metadata
+- Title: {outline['title']}
+- Content Type: {outline['content_type']}
+- Target Words: {outline['total_target_words']}
+- Actual Words: {article['word_count']}
+- SEO Keywords: {', '.join(brief['keywords'])}
+{validation_section}
+
+## Article Content
+{article['markdown']}"""
 
     system = load_prompt("editor_system.txt")
     # Editor returns the full article inside JSON — needs enough tokens for article + scores + corrections
     editor_max_tokens = max(article["word_count"] * 3, 12000)
-    result = call_llm(system, user_prompt, json_mode=True, model=EDITOR_MODEL, max_tokens=editor_max_tokens)
+    if EDITOR_RACE_MODELS:
+        result = call_llm_race(EDITOR_RACE_MODELS, system, user_prompt, json_mode=True, max_tokens=editor_max_tokens)
+        log.info("  Editor response from %s", result["model"])
+    else:
+        result = call_llm(system, user_prompt, json_mode=True, model=EDITOR_MODEL, max_tokens=editor_max_tokens)
     data = result["content"]
 
     breakdown = data.get("score_breakdown", {})
@@ -6,91 +6,124 @@ waste an expensive editor call, and auto-fixes what it can.
 
 import logging
 import re
-from typing import Dict, List, Tuple
+from typing import List, NamedTuple, Optional, Tuple, TypedDict
 
 from scripts.pipeline.models import Article, ArticleOutline
 
 log = logging.getLogger(__name__)
 
+_NORMALIZE_RE = re.compile(r"[^a-z0-9 ]+")
+_HEADING_RE = re.compile(r"^(#{1,4})\s+(.+)$", re.MULTILINE)
+_HEADING_START_RE = re.compile(r"^#{1,4}\s+")
+_BROKEN_LINK_RE = re.compile(r"\[([^\]]*)\]\(([^)]*?)(?:\n|$)")
+_BARE_URL_RE = re.compile(r"(?<!\()(https?://[^\s\)]+)(?!\))")
+# Used by _auto_fix
+_TRAILING_HEADING_RE = re.compile(r"\n(#{1,4}\s+[^\n]*)\s*$")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_HEADING_SPACING_RE = re.compile(r"([^\n])\n(#{1,4}\s+)")
+
 
 def _normalize(text: str) -> str:
     """Lowercase, strip punctuation, collapse whitespace for fuzzy matching."""
-    return re.sub(r"[^a-z0-9 ]+", "", text.lower()).strip()
+    return _NORMALIZE_RE.sub("", text.lower()).strip()
+
+
+class _Heading(NamedTuple):
+    level: int
+    text: str
+    line: int  # 0-based line the heading starts on
+
 
+class _Scan(TypedDict):
+    headings: List[_Heading]
+    table_issues: List[str]              # column-count mismatches within a table
+    nonblank: List[int]                  # nonblank[i] = non-empty lines before line i
 
-def _extract_headings(markdown: str) -> List[Dict[str, str]]:
-    """Extract all headings from markdown with their level and text."""
+
+def _scan(markdown: str) -> _Scan:
+    """Collect everything the structural checks need in one walk over the article.
+
+    Headings still come from _HEADING_RE, since its whitespace match can run on
+    past blank lines and the checks depend on that, but their line numbers are
+    counted incrementally instead of re-counting from the top for each one.
+    """
     headings = []
-    for match in re.finditer(r"^(#{1,4})\s+(.+)$", markdown, re.MULTILINE):
-        headings.append({
-            "level": len(match.group(1)),
-            "text": match.group(2).strip().rstrip("#").strip(),
-            "raw": match.group(0),
-            "start": match.start(),
-            "end": match.end(),
-        })
-    return headings
+    line = pos = 0
+    for match in _HEADING_RE.finditer(markdown):
+        line += markdown.count("\n", pos, match.start())
+        pos = match.start()
+        headings.append(_Heading(
+            level=len(match.group(1)),
+            text=match.group(2).strip().rstrip("#").strip(),
+            line=line,
+        ))
+
+    # Table state: every row of a table should have as many columns as its first
+    table_issues = []
+    in_table = False
+    expected_cols = 0
+    table_start_line = 0
+    nonblank = [0]
+    for i, raw_line in enumerate(markdown.split("\n"), 1):
+        stripped = raw_line.strip()
+        nonblank.append(nonblank[-1] + (1 if stripped else 0))
+        if not stripped:
+            in_table = False
+            continue
+        if stripped[0] != "|" or stripped[-1] != "|":
+            in_table = False
+            continue
+        cols = stripped.count("|") - 1
+        if not in_table:
+            in_table = True
+            expected_cols = cols
+            table_start_line = i
+        elif cols != expected_cols:
+            table_issues.append(
+                f"Table column mismatch at line {i}: expected {expected_cols} cols, got {cols} (table started at line {table_start_line})"
+            )
+
+    return {"headings": headings, "table_issues": table_issues, "nonblank": nonblank}
 
 
 def _check_missing_sections(
-    markdown: str, outline: ArticleOutline
+    headings: List[_Heading], outline: ArticleOutline
 ) -> List[str]:
     """Check that every outline section appears as a heading in the article."""
-    article_headings = [_normalize(h["text"]) for h in _extract_headings(markdown)]
+    article_headings = [_normalize(h.text) for h in headings]
+    heading_tokens = [frozenset(ah.split()) for ah in article_headings]
+    all_headings = " ".join(article_headings)
     missing = []
     for section in outline["sections"]:
         expected = _normalize(section["heading"])
         # Fuzzy match: check if the key words appear in any heading
-        key_words = [w for w in expected.split() if len(w) > 3]
-        found = any(
-            all(kw in ah for kw in key_words)
-            for ah in article_headings
-        ) if key_words else expected in " ".join(article_headings)
+        key_words = frozenset(w for w in expected.split() if len(w) > 3)
+        if not key_words:
+            found = expected in all_headings
+        else:
+            # Whole-word hit first (hashed); the substring scan still lets
+            # "cream" match a "Creams" heading
+            found = any(key_words <= tokens for tokens in heading_tokens) or any(
+                all(kw in ah for kw in key_words)
+                for ah in article_headings
+            )
         if not found:
             missing.append(section["heading"])
     return missing
 
 
-def _check_empty_headings(markdown: str) -> List[str]:
+def _check_empty_headings(scan: _Scan) -> List[str]:
     """Find headings with no content before the next heading or end of file."""
     issues = []
-    headings = _extract_headings(markdown)
-    lines = markdown.split("\n")
+    headings = scan["headings"]
+    nonblank = scan["nonblank"]
+    total_lines = len(nonblank) - 1
     for i, h in enumerate(headings):
-        # Find content between this heading and the next (or EOF)
-        h_line = markdown[:h["start"]].count("\n")
-        if i + 1 < len(headings):
-            next_line = markdown[:headings[i + 1]["start"]].count("\n")
-        else:
-            next_line = len(lines)
-
-        content_between = "\n".join(lines[h_line + 1:next_line]).strip()
-        if not content_between:
-            issues.append(f"Empty heading: '{h['text']}' has no content after it")
-    return issues
-
-
-def _check_tables(markdown: str) -> List[str]:
-    """Validate markdown table formatting."""
-    issues = []
-    in_table = False
-    expected_cols = 0
-    table_start_line = 0
-
-    for i, line in enumerate(markdown.split("\n"), 1):
-        stripped = line.strip()
-        if stripped.startswith("|") and stripped.endswith("|"):
-            cols = stripped.count("|") - 1
-            if not in_table:
-                in_table = True
-                expected_cols = cols
-                table_start_line = i
-            elif cols != expected_cols:
-                issues.append(
-                    f"Table column mismatch at line {i}: expected {expected_cols} cols, got {cols} (table started at line {table_start_line})"
-                )
-        else:
-            in_table = False
+        # No non-blank line between this heading and the next (or EOF). Headings
+        # start on strictly increasing lines, so the range is never negative.
+        next_line = headings[i + 1].line if i + 1 < len(headings) else total_lines
+        if nonblank[next_line] == nonblank[h.line + 1]:
+            issues.append(f"Empty heading: '{h.text}' has no content after it")
     return issues
 
 
@@ -98,15 +131,15 @@ def _check_links(markdown: str) -> List[str]:
     """Check for malformed markdown links."""
     issues = []
     # Find links missing closing paren or bracket
-    for match in re.finditer(r"\[([^\]]*)\]\(([^)]*?)(?:\n|$)", markdown):
+    for match in _BROKEN_LINK_RE.finditer(markdown):
         issues.append(f"Possibly broken link: [{match.group(1)}]({match.group(2)}...")
     # Find bare URLs that should be linked
-    for match in re.finditer(r"(?<!\()(https?://[^\s\)]+)(?!\))", markdown):
-        url = match.group(1)
-        # Skip if it's inside a markdown link already
-        before = markdown[max(0, match.start() - 2):match.start()]
-        if "(" not in before:
-            issues.append(f"Bare URL should be a markdown link: {url[:60]}")
+    for match in _BARE_URL_RE.finditer(markdown):
+        # Skip if it's inside a markdown link already — the pattern rules out a
+        # "(" right before the URL, so only the character before that is left
+        start = match.start()
+        if start < 2 or markdown[start - 2] != "(":
+            issues.append(f"Bare URL should be a markdown link: {match.group(1)[:60]}")
     return issues
 
 
@@ -128,17 +161,26 @@ def _check_word_count(article: Article, outline: ArticleOutline) -> List[str]:
     return issues
 
 
+def _last_nonblank_line(markdown: str) -> Optional[str]:
+    """The last line with any content, stripped — found from the end of the text."""
+    end = len(markdown)
+    while end and markdown[end - 1].isspace():
+        end -= 1
+    if not end:
+        return None
+    start = markdown.rfind("\n", 0, end) + 1
+    return markdown[start:end].strip()
+
+
 def _check_abrupt_ending(markdown: str) -> List[str]:
     """Check if the article ends abruptly."""
     issues = []
-    lines = [l.strip() for l in markdown.strip().split("\n") if l.strip()]
-    if not lines:
+    last_line = _last_nonblank_line(markdown)
+    if last_line is None:
         return ["Article is empty"]
 
-    last_line = lines[-1]
-
     # Ends with a heading (no content after it)
-    if re.match(r"^#{1,4}\s+", last_line):
+    if _HEADING_START_RE.match(last_line):
         issues.append(f"Article ends with a heading and no content: '{last_line}'")
 
     # Ends mid-sentence (no terminal punctuation)
@@ -161,7 +203,7 @@ def _auto_fix(markdown: str, issues: List[str]) -> Tuple[str, List[str]]:
     fixes = []
 
     # Fix 1: Remove trailing empty headings (## with nothing after)
-    trailing_heading = re.search(r"\n(#{1,4}\s+[^\n]*)\s*$", fixed)
+    trailing_heading = _TRAILING_HEADING_RE.search(fixed)
     if trailing_heading:
         heading_text = trailing_heading.group(1).strip()
         # Check if there's no content after this heading
@@ -172,13 +214,13 @@ def _auto_fix(markdown: str, issues: List[str]) -> Tuple[str, List[str]]:
 
     # Fix 2: Remove duplicate blank lines (3+ → 2)
     before = fixed
-    fixed = re.sub(r"\n{3,}", "\n\n", fixed)
+    fixed = _BLANK_LINES_RE.sub("\n\n", fixed)
     if fixed != before:
         fixes.append("Collapsed excessive blank lines")
 
     # Fix 3: Fix heading spacing (ensure blank line before headings)
     before = fixed
-    fixed = re.sub(r"([^\n])\n(#{1,4}\s+)", r"\1\n\n\2", fixed)
+    fixed = _HEADING_SPACING_RE.sub(r"\1\n\n\2", fixed)
     if fixed != before:
         fixes.append("Added missing blank lines before headings")
 
@@ -197,15 +239,16 @@ def run(article: Article, outline: ArticleOutline) -> Tuple[Article, dict]:
     """
     markdown = article["markdown"]
     all_issues: List[str] = []
+    scan = _scan(markdown)
 
     # Run all checks
-    missing_sections = _check_missing_sections(markdown, outline)
+    missing_sections = _check_missing_sections(scan["headings"], outline)
     if missing_sections:
         for section in missing_sections:
             all_issues.append(f"Missing outline section: '{section}'")
 
-    all_issues.extend(_check_empty_headings(markdown))
-    all_issues.extend(_check_tables(markdown))
+    all_issues.extend(_check_empty_headings(scan))
+    all_issues.extend(scan["table_issues"])
     all_issues.extend(_check_links(markdown))
     all_issues.extend(_check_word_count(article, outline))
     all_issues.extend(_check_abrupt_ending(markdown))
@@ -1,6 +1,5 @@
 """Stage 2 — Outline Agent: produces a section-by-section skeleton from a research brief."""
 
-import json
 import logging
 
 from slugify import slugify
@@ -66,7 +65,8 @@ Return JSON with these exact keys."""
 
     outline = ArticleOutline(
         title=data.get("title", brief["topic"]),
-        slug=data.get("slug", slugify(brief["topic"])),
+        # Only slugify the topic when the model didn't return a slug
+        slug=data["slug"] if "slug" in data else slugify(brief["topic"]),
         meta_title=data.get("meta_title", data.get("title", brief["topic"]))[:60],
         meta_description=data.get("meta_description", "")[:160],
         content_type=brief["content_type"],
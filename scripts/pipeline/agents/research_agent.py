@@ -2,28 +2,53 @@
 
 import json
 import logging
-from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from scripts.pipeline.agents.base_agent import call_llm, load_prompt
 from scripts.pipeline.config import AFFILIATE_PRODUCTS_PATH, RESEARCH_MODEL
 from scripts.pipeline.models import ResearchBrief
 from scripts.pipeline.publishing import sanity_client
-from scripts.pipeline.publishing.sanity_queries import (
-    CONTENT_COUNTS_BY_TYPE,
-    EXISTING_COMPARISON_SLUGS,
-    EXISTING_REVIEW_SLUGS,
-    EXISTING_USECASE_SLUGS,
-    PRODUCTS_WITHOUT_REVIEWS,
-)
+from scripts.pipeline.publishing.sanity_queries import CONTENT_GAPS
 
 log = logging.getLogger(__name__)
 
 
-def _load_affiliate_products() -> list:
-    with open(AFFILIATE_PRODUCTS_PATH, "r") as f:
-        data = json.load(f)
-    return data.get("products", [])
+# (mtime, products, products by name, prompt summary) — rebuilt only when the file changes
+_products_cache: Optional[Tuple[float, list, Dict[str, dict], str]] = None
+
+
+def _summarize_products(products: list) -> str:
+    """The product list as shown to the research model."""
+    return json.dumps(
+        [
+            {
+                "product_name": p["product_name"],
+                "brand": p["brand"],
+                "category": p.get("category", ""),
+                "use_case": p.get("use_case", ""),
+                "mechanism": p.get("mechanism", ""),
+                "asin": p.get("asin", ""),
+            }
+            for p in products
+        ],
+        indent=2,
+    )
+
+
+def _load_affiliate_products() -> Tuple[list, Dict[str, dict], str]:
+    """Return the affiliate products, a product_name -> product lookup, and the prompt summary."""
+    global _products_cache
+    mtime = AFFILIATE_PRODUCTS_PATH.stat().st_mtime
+    if _products_cache is None or _products_cache[0] != mtime:
+        with open(AFFILIATE_PRODUCTS_PATH, "r") as f:
+            products = json.load(f).get("products", [])
+        _products_cache = (
+            mtime,
+            products,
+            {p["product_name"]: p for p in products},
+            _summarize_products(products),
+        )
+    return _products_cache[1:]
 
 
 def _gather_gaps(dry_run: bool = False) -> dict:
@@ -38,13 +63,8 @@ def _gather_gaps(dry_run: bool = False) -> dict:
         }
 
     try:
-        return {
-            "products_without_reviews": sanity_client.query(PRODUCTS_WITHOUT_REVIEWS),
-            "content_counts": sanity_client.query(CONTENT_COUNTS_BY_TYPE),
-            "existing_usecase_slugs": sanity_client.query(EXISTING_USECASE_SLUGS),
-            "existing_review_slugs": sanity_client.query(EXISTING_REVIEW_SLUGS),
-            "existing_comparison_slugs": sanity_client.query(EXISTING_COMPARISON_SLUGS),
-        }
+        # All five lookups as one GROQ object projection — one request, not five
+        return sanity_client.query(CONTENT_GAPS)
     except Exception as e:
         log.warning("Could not query Sanity for gaps: %s — using affiliate data only", e)
         return {
@@ -64,24 +84,9 @@ def run(
 
     Returns (list[ResearchBrief], total_tokens_used).
     """
-    products = _load_affiliate_products()
+    _, product_lookup, product_summary = _load_affiliate_products()
     gaps = _gather_gaps(dry_run=dry_run)
 
-    product_summary = json.dumps(
-        [
-            {
-                "product_name": p["product_name"],
-                "brand": p["brand"],
-                "category": p.get("category", ""),
-                "use_case": p.get("use_case", ""),
-                "mechanism": p.get("mechanism", ""),
-                "asin": p.get("asin", ""),
-            }
-            for p in products
-        ],
-        indent=2,
-    )
-
     user_prompt = f"""Here is the current content inventory and available product data.
 
 ## Content Gaps from CMS
@@ -115,7 +120,6 @@ Return a JSON object with a single key "briefs" containing the array of 3 object
     raw_briefs = result["content"].get("briefs", [])
 
     # Enrich each brief with full product data
-    product_lookup = {p["product_name"]: p for p in products}
     briefs: List[ResearchBrief] = []
     for rb in raw_briefs:
         relevant = [
@@ -2,7 +2,8 @@
 
 import json
 import logging
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict
 
 from slugify import slugify
 
@@ -14,12 +15,22 @@ from scripts.pipeline.publishing.sanity_queries import EXISTING_REVIEWS_WITH_PRO
 
 log = logging.getLogger(__name__)
 
-# Map domain names to their prompt files
-_DOMAIN_PROMPTS: Dict[str, str] = {
-    "joint_pain": "writer_joint_pain_system.txt",
-    "muscle_pain": "writer_muscle_pain_system.txt",
-    "product_review": "writer_product_review_system.txt",
+# Domain specialist system prompts, read once at import
+_DOMAIN_SYSTEM_PROMPTS: Dict[str, str] = {
+    domain: load_prompt(filename)
+    for domain, filename in {
+        "joint_pain": "writer_joint_pain_system.txt",
+        "muscle_pain": "writer_muscle_pain_system.txt",
+        "product_review": "writer_product_review_system.txt",
+    }.items()
 }
+_DEFAULT_SYSTEM_PROMPT = _DOMAIN_SYSTEM_PROMPTS["joint_pain"]
+
+
+@lru_cache(maxsize=None)
+def _product_slug(name: str) -> str:
+    """Fallback page slug for a product; the same products recur across a run's briefs."""
+    return slugify(name)
 
 
 def _build_internal_links(products: list, existing_reviews: list) -> str:
@@ -38,13 +49,12 @@ def _build_internal_links(products: list, existing_reviews: list) -> str:
     for p in products:
         name = p["product_name"]
         name_lower = name.lower()
-        product_slug = slugify(name)
 
         if name_lower in review_lookup:
             url = f"/review/{review_lookup[name_lower]}"
             lines.append(f"- {name}: [{name}]({url}) (review page)")
         else:
-            url = f"/review/{product_slug}"
+            url = f"/review/{_product_slug(name)}"
             lines.append(f"- {name}: [{name}]({url}) (product page)")
 
     return "\n".join(lines)
@@ -56,8 +66,7 @@ def run(brief: ResearchBrief, outline: ArticleOutline, dry_run: bool = False) ->
     Returns (Article, total_tokens_used).
     """
     domain = brief["domain"]
-    prompt_file = _DOMAIN_PROMPTS.get(domain, "writer_joint_pain_system.txt")
-    system_prompt = load_prompt(prompt_file)
+    system_prompt = _DOMAIN_SYSTEM_PROMPTS.get(domain, _DEFAULT_SYSTEM_PROMPT)
 
     product_details = json.dumps(
         [
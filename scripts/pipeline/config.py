@@ -21,6 +21,9 @@ RESEARCH_MODEL = os.getenv("RESEARCH_MODEL", "google/gemini-2.0-flash")
 OUTLINE_MODEL = os.getenv("OUTLINE_MODEL", "google/gemini-2.0-flash")
 WRITER_MODEL = os.getenv("WRITER_MODEL", "anthropic/claude-sonnet-4-5-20250929")
 EDITOR_MODEL = os.getenv("EDITOR_MODEL", "anthropic/claude-sonnet-4-5-20250929")
+# Optional: comma-separated models to race for the editor stage (first valid
+# response wins; the others are still billed). Empty = just EDITOR_MODEL.
+EDITOR_RACE_MODELS = [m.strip() for m in os.getenv("EDITOR_RACE_MODELS", "").split(",") if m.strip()]
 
 # Legacy fallback (used if no provider-specific key is available)
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
@@ -43,6 +46,20 @@ DATA_DIR = _project_root / "data"
 AFFILIATE_PRODUCTS_PATH = DATA_DIR / "affiliate_products.json"
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
 
+# ── LLM response cache ─────────────────────────────────────────────────────
+# Opt-in (LLM_CACHE=1): identical calls are answered from disk instead of the
+# provider — meant for re-running the pipeline while debugging later stages
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes")
+LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", str(_project_root / ".cache" / "llm")))
+
+# Opt-in (SEMANTIC_CACHE_THRESHOLD=0.98): a call whose user prompt embeds within
+# this cosine similarity of an earlier one (same model and system prompt) reuses
+# its completion. Only applies at low temperature — creative calls always go out.
+_semantic_threshold = os.getenv("SEMANTIC_CACHE_THRESHOLD", "")
+SEMANTIC_CACHE_THRESHOLD = float(_semantic_threshold) if _semantic_threshold else None
+SEMANTIC_CACHE_MAX_TEMPERATURE = 0.3
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
 # ── Pipeline metadata ──────────────────────────────────────────────────────
 PIPELINE_VERSION = "1.1.0"
 
@@ -66,3 +83,9 @@ COST_PER_DALLE_IMAGE = 0.04         # DALL-E 3 1024x1024
 AMAZON_IMAGE_BASE = "https://m.media-amazon.com/images/I"
 DALLE_IMAGE_SIZE = "1024x1024"
 DALLE_IMAGE_QUALITY = "standard"
+DALLE_MAX_CONCURRENCY = 8          # parallel image requests when a run pre-generates its images
+# Opt-in (DALLE_CACHE_THRESHOLD=0.92): reuse an uploaded editorial image when a
+# new topic embeds within this cosine similarity of an earlier one with the same
+# prompt template. The topic-free review/comparison prompts are never reused.
+_dalle_threshold = os.getenv("DALLE_CACHE_THRESHOLD", "")
+DALLE_CACHE_THRESHOLD = float(_dalle_threshold) if _dalle_threshold else None
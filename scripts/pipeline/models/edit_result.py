@@ -1,6 +1,6 @@
 """Data contract for the Editor Agent output."""
 
-from typing import TypedDict, List, Optional
+from typing import TypedDict, List
 
 
 class ScoreBreakdown(TypedDict):
@@ -1,6 +1,7 @@
 """Thin wrapper around the existing markdown_to_portable_text converter."""
 
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 # Add scripts/ to path so the legacy module is importable
@@ -11,6 +12,12 @@ if str(_scripts_dir) not in sys.path:
 from markdown_to_portable_text import markdown_to_portable_text  # noqa: E402
 
 
+@lru_cache(maxsize=64)
 def to_portable_text(markdown: str) -> list:
-    """Convert markdown string to Sanity Portable Text blocks."""
+    """Convert markdown string to Sanity Portable Text blocks.
+
+    Memoized on the markdown itself — a single-paragraph article is both a
+    doc's introduction and its content, and re-publishing an unchanged edit
+    shouldn't re-parse it. The returned list is shared, so don't mutate it.
+    """
     return markdown_to_portable_text(markdown)
@@ -1,22 +1,52 @@
 """Image acquisition — fetches product images from Amazon or generates editorial images via DALL-E 3."""
 
+import hashlib
+import json
 import logging
-from typing import Optional
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from openai import OpenAI
 
 from scripts.pipeline.config import (
+    DALLE_CACHE_THRESHOLD,
     DALLE_IMAGE_QUALITY,
     DALLE_IMAGE_SIZE,
+    DALLE_MAX_CONCURRENCY,
     OPENAI_API_KEY,
+    SANITY_DATASET,
+    SANITY_PROJECT_ID,
 )
 from scripts.pipeline.publishing.sanity_client import upload_image
+from scripts.pipeline.utils import llm_cache
 
 log = logging.getLogger(__name__)
 
 _oai = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
+# Shared keep-alive session for Amazon pages and image downloads, sized for
+# the prefetch pool so concurrent downloads don't queue for a connection
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=DALLE_MAX_CONCURRENCY))
+
+# Tried in order on the Amazon product page; each stops at its first match, and
+# og:image sits in <head>, so the usual case never scans past the first few KB
+_AMAZON_IMAGE_PATTERNS = (
+    re.compile(r'<meta\s+property=["\']og:image["\']\s+content=["\']([^"\']+)["\']'),
+    re.compile(r'"hiRes":"(https://m\.media-amazon\.com/images/I/[^"]+)"'),
+    re.compile(r'"large":"(https://m\.media-amazon\.com/images/I/[^"]+)"'),
+)
+
+# Legacy image URL derived from the ASIN alone. For an ASIN without one Amazon
+# answers 200 with a 1x1 GIF rather than a 404, which the size check rejects.
+_ASIN_IMAGE_URL = "https://images-na.ssl-images-amazon.com/images/P/{asin}.01.L.jpg"
+
+MAX_IMAGE_BYTES = 5_000_000
+_DOWNLOAD_CHUNK = 64 * 1024
+
 # ── DALL-E prompt templates per content type ────────────────────────────────
 _DALLE_PROMPTS = {
     "best-for": (
@@ -39,15 +69,116 @@ _DALLE_PROMPTS = {
 }
 
 
+def _template(content_type: str) -> str:
+    return _DALLE_PROMPTS.get(content_type, _DALLE_PROMPTS["best-for"])
+
+
+def _image_cache_scope(template: str) -> str:
+    """Hash the generation settings an image is only reusable under."""
+    payload = json.dumps(
+        ["dall-e-3", DALLE_IMAGE_SIZE, DALLE_IMAGE_QUALITY, template, SANITY_PROJECT_ID, SANITY_DATASET]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _asset_cache_key(kind: str, value: str) -> str:
+    """Cache key for an uploaded asset id, looked up by image sha1 or by ASIN.
+
+    Asset ids only exist in one dataset, so the project and dataset are part
+    of the key.
+    """
+    payload = json.dumps(["sanity-asset", SANITY_PROJECT_ID, SANITY_DATASET, kind, value])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember_asset(key: str, asset_id: str) -> None:
+    try:
+        llm_cache.put(key, asset_id)
+    except OSError as e:
+        log.warning("Could not cache asset id %s: %s", asset_id, e)
+
+
+def _image_ref(asset_id: str) -> dict:
+    return {"_type": "image", "asset": {"_type": "reference", "_ref": asset_id}}
+
+
+def _cached_editorial_asset(topic: str, content_type: str) -> Optional[str]:
+    """Sanity asset id of an earlier editorial image for the same or a similar topic."""
+    template = _template(content_type)
+    # A topic-free prompt would hand one image to every article of its type
+    if DALLE_CACHE_THRESHOLD is None or "{topic}" not in template:
+        return None
+    scope = _image_cache_scope(template)
+    try:
+        from scripts.pipeline.utils import semantic_cache
+        vec = semantic_cache.embed(f"{content_type}|{topic}")
+        return semantic_cache.lookup(scope, vec, DALLE_CACHE_THRESHOLD)
+    except Exception as e:
+        log.warning("Image cache unavailable, generating a new image: %s", e)
+        return None
+
+
+def _remember_editorial_asset(topic: str, content_type: str, asset_id: str) -> None:
+    """Record an uploaded editorial image so later similar topics reuse it."""
+    template = _template(content_type)
+    if DALLE_CACHE_THRESHOLD is None or "{topic}" not in template:
+        return
+    scope = _image_cache_scope(template)
+    try:
+        from scripts.pipeline.utils import semantic_cache
+        semantic_cache.store(scope, semantic_cache.embed(f"{content_type}|{topic}"), asset_id)
+    except Exception as e:
+        log.warning("Could not cache image for '%s': %s", topic, e)
+
+
+def _download_image(url: str, timeout: int, headers: Optional[dict] = None) -> Optional[bytes]:
+    """Stream an image download, giving up on non-images or anything over MAX_IMAGE_BYTES.
+
+    Returns the bytes, or None (logged) for a non-200, non-image or oversized
+    response. Connection errors propagate as requests.RequestException.
+    """
+    with _http.get(url, headers=headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            log.warning("Image download returned %d: %s", resp.status_code, url[:80])
+            return None
+        content_type = resp.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            log.warning("Image download is %s, not an image: %s", content_type or "untyped", url[:80])
+            return None
+        try:
+            declared = int(resp.headers.get("Content-Length") or 0)
+        except ValueError:
+            declared = 0  # Malformed header — leave it to the streaming cap below
+        if declared > MAX_IMAGE_BYTES:
+            log.warning("Image download too large (%d bytes): %s", declared, url[:80])
+            return None
+        buf = bytearray()
+        for chunk in resp.iter_content(_DOWNLOAD_CHUNK):
+            buf += chunk
+            if len(buf) > MAX_IMAGE_BYTES:
+                log.warning("Image download over %d bytes, aborted: %s", MAX_IMAGE_BYTES, url[:80])
+                return None
+        return bytes(buf)
+
+
 def fetch_product_image(asin: str) -> Optional[bytes]:
     """Try to download a product image from Amazon using the ASIN.
 
-    Fetches the product page and extracts the Open Graph image URL, then downloads it.
+    Tries the image URL derived from the ASIN first; failing that, fetches the
+    product page and extracts the Open Graph image URL, then downloads it.
     Returns image bytes or None.
     """
     if not asin:
         return None
 
+    try:
+        image_bytes = _download_image(_ASIN_IMAGE_URL.format(asin=asin), timeout=10)
+        if image_bytes and len(image_bytes) > 1000:
+            log.info("Fetched product image by ASIN URL for %s", asin)
+            return image_bytes
+    except requests.RequestException as e:
+        log.debug("ASIN image URL failed for %s, trying the product page: %s", asin, e)
+
     product_url = f"https://www.amazon.com/dp/{asin}"
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
@@ -55,26 +186,25 @@ def fetch_product_image(asin: str) -> Optional[bytes]:
     }
 
     try:
-        resp = requests.get(product_url, headers=headers, timeout=10, allow_redirects=True)
+        resp = _http.get(product_url, headers=headers, timeout=10, allow_redirects=True)
         if resp.status_code != 200:
             log.warning("Amazon page returned %d for ASIN %s", resp.status_code, asin)
             return None
 
-        # Extract og:image or main product image from HTML
-        import re
-        og_match = re.search(r'<meta\s+property=["\']og:image["\']\s+content=["\']([^"\']+)["\']', resp.text)
-        if not og_match:
-            # Try the landing image pattern
-            og_match = re.search(r'"hiRes":"(https://m\.media-amazon\.com/images/I/[^"]+)"', resp.text)
-        if not og_match:
-            og_match = re.search(r'"large":"(https://m\.media-amazon\.com/images/I/[^"]+)"', resp.text)
+        # Extract og:image, else the landing image's hiRes/large URL
+        html = resp.text
+        og_match = None
+        for pattern in _AMAZON_IMAGE_PATTERNS:
+            og_match = pattern.search(html)
+            if og_match:
+                break
 
         if og_match:
             img_url = og_match.group(1)
-            img_resp = requests.get(img_url, headers=headers, timeout=10)
-            if img_resp.status_code == 200 and len(img_resp.content) > 1000:
+            image_bytes = _download_image(img_url, timeout=10, headers=headers)
+            if image_bytes and len(image_bytes) > 1000:
                 log.info("Fetched product image from Amazon for ASIN %s", asin)
-                return img_resp.content
+                return image_bytes
 
     except requests.RequestException as e:
         log.warning("Failed to fetch Amazon page for ASIN %s: %s", asin, e)
@@ -89,8 +219,7 @@ def generate_editorial_image(topic: str, content_type: str) -> Optional[bytes]:
         log.warning("OpenAI client not configured — skipping image generation")
         return None
 
-    template = _DALLE_PROMPTS.get(content_type, _DALLE_PROMPTS["best-for"])
-    prompt = template.format(topic=topic)
+    prompt = _template(content_type).format(topic=topic)
 
     try:
         response = _oai.images.generate(
@@ -101,40 +230,78 @@ def generate_editorial_image(topic: str, content_type: str) -> Optional[bytes]:
             n=1,
         )
         image_url = response.data[0].url
-        img_resp = requests.get(image_url, timeout=30)
-        img_resp.raise_for_status()
+        image_bytes = _download_image(image_url, timeout=30)
+        if image_bytes is None:
+            return None
         log.info("Generated DALL-E image for '%s' (%s)", topic, content_type)
-        return img_resp.content
+        return image_bytes
     except Exception as e:
         log.error("DALL-E image generation failed: %s", e)
         return None
 
 
+def _prefetch_editorial_image(topic: str, content_type: str) -> Optional[bytes]:
+    # A cached image is picked up by acquire_image — don't pay for a new one
+    if _cached_editorial_asset(topic, content_type):
+        return None
+    return generate_editorial_image(topic, content_type)
+
+
+def generate_editorial_images_bulk(items: List[Tuple[str, str]]) -> List["Future[Optional[bytes]]"]:
+    """Start DALL-E generation for every (topic, content_type) pair at once.
+
+    Returns one future per item, in order, resolving to the image bytes or None
+    (None also when the image cache already has one for that topic).
+    Returns immediately — the requests run in the background, at most
+    DALLE_MAX_CONCURRENCY at a time, so a run waits about one generation
+    instead of one per article.
+    """
+    pool = ThreadPoolExecutor(max_workers=DALLE_MAX_CONCURRENCY, thread_name_prefix="dalle")
+    futures = [pool.submit(_prefetch_editorial_image, topic, content_type) for topic, content_type in items]
+    pool.shutdown(wait=False)
+    return futures
+
+
 def acquire_image(
     topic: str,
     content_type: str,
     asin: Optional[str] = None,
     dry_run: bool = False,
+    image_bytes: Optional[bytes] = None,
 ) -> Optional[dict]:
     """Get an image — from Amazon for products, DALL-E for editorial — and upload to Sanity.
 
+    image_bytes is an editorial image generated ahead of time (see
+    generate_editorial_images_bulk); when given, it is uploaded as-is.
+
     Returns a Sanity image reference dict like {"_type": "image", "asset": {"_type": "reference", "_ref": "image-..."}}
     or None if no image could be acquired.
     """
-    image_bytes: Optional[bytes] = None
-    filename = "image.jpg"
+    filename = f"editorial-{content_type}.jpg"
+    from_amazon = False
 
-    # Strategy 1: use product image from Amazon if ASIN is available
-    if asin:
+    # Strategy 1: use product image from Amazon if ASIN is available — unless
+    # an earlier run already uploaded it
+    if image_bytes is None and asin:
+        asset_id = None if dry_run else llm_cache.get(_asset_cache_key("asin", asin))
+        if asset_id:
+            log.info("Reusing uploaded product image for ASIN %s: %s", asin, asset_id)
+            return _image_ref(asset_id)
         image_bytes = fetch_product_image(asin)
         if image_bytes:
             filename = f"product-{asin}.jpg"
+            from_amazon = True
 
-    # Strategy 2: generate editorial image via DALL-E
+    # Strategy 2: reuse an editorial image already uploaded for a similar topic
+    if image_bytes is None:
+        asset_id = _cached_editorial_asset(topic, content_type)
+        if asset_id:
+            log.info("Reusing cached editorial image for '%s' (%s)", topic, content_type)
+            return _image_ref(asset_id)
+
+    # Strategy 3: generate editorial image via DALL-E
     if image_bytes is None:
         image_bytes = generate_editorial_image(topic, content_type)
-        if image_bytes:
-            filename = f"editorial-{content_type}.jpg"
 
     if image_bytes is None:
         return None
@@ -143,11 +310,21 @@ def acquire_image(
         log.info("DRY RUN — would upload %d bytes as %s", len(image_bytes), filename)
         return {"_type": "image", "asset": {"_type": "reference", "_ref": "image-dry-run"}}
 
-    asset_id = upload_image(image_bytes, filename)
-    if not asset_id:
-        return None
+    # Identical bytes were uploaded before (same product image, or a repeated
+    # DALL-E result): point at that asset instead of re-sending the payload
+    digest_key = _asset_cache_key("sha1", hashlib.sha1(image_bytes).hexdigest())
+    asset_id = llm_cache.get(digest_key)
+    if asset_id:
+        log.info("Image already uploaded as %s — skipping upload", asset_id)
+    else:
+        asset_id = upload_image(image_bytes, filename)
+        if not asset_id:
+            return None
+        _remember_asset(digest_key, asset_id)
 
-    return {
-        "_type": "image",
-        "asset": {"_type": "reference", "_ref": asset_id},
-    }
+    if from_amazon:
+        _remember_asset(_asset_cache_key("asin", asin), asset_id)
+    else:
+        _remember_editorial_asset(topic, content_type, asset_id)
+
+    return _image_ref(asset_id)
@@ -2,34 +2,51 @@
 
 import logging
 import re
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
-
-from slugify import slugify
+from typing import Dict, List, Optional, Tuple
 
 from scripts.pipeline.config import PIPELINE_VERSION, PUBLISH_THRESHOLD
 from scripts.pipeline.models import ArticleOutline, EditResult, ResearchBrief
 from scripts.pipeline.publishing.content_formatter import to_portable_text
-from scripts.pipeline.publishing.image_generator import acquire_image
+from scripts.pipeline.publishing.image_generator import acquire_image, generate_editorial_images_bulk
 from scripts.pipeline.publishing.sanity_client import mutate, query
-from scripts.pipeline.publishing.sanity_queries import PRODUCT_BY_NAME, PRODUCT_BY_NAME_CONTAINS
+from scripts.pipeline.publishing.sanity_queries import (
+    PRODUCT_BY_NAME,
+    PRODUCT_BY_NAME_CONTAINS,
+    PRODUCTS_BY_NAMES,
+)
 
 log = logging.getLogger(__name__)
 
+_MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+_ORDERED_ITEM_RE = re.compile(r'^\d+\.')
+_EXCERPT_FORMAT_RE = re.compile(r'[*_#>]')
+_LIST_LEAD_RE = re.compile(r'^[\s*\-]+')
+_EMPHASIS_RE = re.compile(r'[*_]')
+
 
-def _find_product_ref(product_name: str, dry_run: bool = False) -> Optional[dict]:
+def _find_product_ref(
+    product_name: str,
+    dry_run: bool = False,
+    product_refs: Optional[Dict[str, dict]] = None,
+) -> Optional[dict]:
     """Look up a product in Sanity by name and return a reference dict.
 
-    Tries exact match first, then falls back to partial name search.
+    Tries exact match first, then falls back to partial name search. With
+    product_refs (see prefetch_product_refs) the exact match is a dict lookup.
     """
     if dry_run or not product_name:
         return None
+    if product_refs is not None and product_name.lower() in product_refs:
+        return product_refs[product_name.lower()]
     try:
-        # Try exact match
-        result = query(PRODUCT_BY_NAME, {"name": product_name})
-        if result and result.get("_id"):
-            log.info("Found product ref (exact) for '%s': %s", product_name, result["_id"])
-            return {"_type": "reference", "_ref": result["_id"]}
+        # Try exact match (already covered by a prefetched map)
+        if product_refs is None:
+            result = query(PRODUCT_BY_NAME, {"name": product_name})
+            if result and result.get("_id"):
+                log.info("Found product ref (exact) for '%s': %s", product_name, result["_id"])
+                return {"_type": "reference", "_ref": result["_id"]}
 
         # Fuzzy fallback: search by brand + key word from product name
         # e.g. "Aspercreme Arthritis Pain Relief Gel" -> search "Aspercreme*"
@@ -48,34 +65,30 @@ def _find_product_ref(product_name: str, dry_run: bool = False) -> Optional[dict
 
 def _strip_markdown_links(text: str) -> str:
     """Convert markdown links [text](url) to just the text."""
-    return re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    return _MD_LINK_RE.sub(r'\1', text)
 
 
-def _extract_excerpt(markdown: str, max_len: int = 300) -> str:
-    """Pull the first meaningful paragraph from markdown as the excerpt.
+def _paragraph_text(line: str) -> Optional[str]:
+    """The stripped line if it can be part of the excerpt paragraph, else None.
 
-    Ensures the excerpt ends at a complete sentence, never mid-word or mid-sentence.
+    Headings, tables, rules, list items and blank lines don't count.
     """
-    # Collect paragraph text (skip headings, tables, rules)
-    paragraph = ""
-    for line in markdown.splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or line.startswith("|") or line.startswith("---"):
-            if paragraph:
-                break
-            continue
-        if line.startswith("-") or line.startswith("*") or re.match(r'^\d+\.', line):
-            if paragraph:
-                break
-            continue
-        paragraph += " " + line if paragraph else line
+    line = line.strip()
+    if not line or line.startswith("#") or line.startswith("|") or line.startswith("---"):
+        return None
+    if line.startswith("-") or line.startswith("*") or _ORDERED_ITEM_RE.match(line):
+        return None
+    return line
+
 
+def _finish_excerpt(paragraph: str, max_len: int) -> str:
+    """Strip formatting from the excerpt paragraph and cut it at a sentence end."""
     if not paragraph:
         return ""
 
     # Strip markdown formatting and links
     clean = _strip_markdown_links(paragraph)
-    clean = re.sub(r'[*_#>]', '', clean).strip()
+    clean = _EXCERPT_FORMAT_RE.sub('', clean).strip()
 
     if len(clean) <= max_len:
         return clean
@@ -95,11 +108,40 @@ def _extract_excerpt(markdown: str, max_len: int = 300) -> str:
     return truncated.strip() + "..."
 
 
-def _extract_pros_cons(markdown: str) -> tuple:
-    """Pull pros/cons from review markdown as plain text (no markdown links)."""
+def _extract_excerpt(markdown: str, max_len: int = 300) -> str:
+    """Pull the first meaningful paragraph from markdown as the excerpt.
+
+    Ensures the excerpt ends at a complete sentence, never mid-word or mid-sentence.
+    """
+    paragraph = ""
+    for line in markdown.splitlines():
+        text = _paragraph_text(line)
+        if text is None:
+            if paragraph:
+                break
+            continue
+        paragraph += " " + text if paragraph else text
+    return _finish_excerpt(paragraph, max_len)
+
+
+def _extract_review_fields(markdown: str, max_len: int = 300) -> Tuple[str, List[str], List[str]]:
+    """Excerpt and pros/cons for a review, from a single walk over the lines.
+
+    The excerpt is the same as _extract_excerpt's; pros/cons come back as
+    plain text (no markdown links), at most 8 of each.
+    """
+    paragraph = ""
+    in_excerpt = True
     pros, cons = [], []
     current = None
     for line in markdown.splitlines():
+        if in_excerpt:
+            text = _paragraph_text(line)
+            if text is not None:
+                paragraph += " " + text if paragraph else text
+            elif paragraph:
+                in_excerpt = False
+
         lower = line.strip().lower()
         if "pros" in lower and ("##" in line or "**" in lower):
             current = "pros"
@@ -111,25 +153,29 @@ def _extract_pros_cons(markdown: str) -> tuple:
             current = None
             continue
 
-        item = re.sub(r'^[\s*\-]+', '', line).strip()
+        item = _LIST_LEAD_RE.sub('', line).strip()
         if item:
             # Strip markdown link syntax — pros/cons are plain strings
             item = _strip_markdown_links(item)
-            item = re.sub(r'[*_]', '', item).strip()
+            item = _EMPHASIS_RE.sub('', item).strip()
             if current == "pros":
                 pros.append(item)
             elif current == "cons":
                 cons.append(item)
-    return pros[:8], cons[:8]
+    return _finish_excerpt(paragraph, max_len), pros[:8], cons[:8]
 
 
-def _build_review_doc(brief: ResearchBrief, outline: ArticleOutline, edit: EditResult, image_ref: Optional[dict], dry_run: bool = False) -> dict:
-    """Build a review document mutation."""
+def _build_review_doc(brief: ResearchBrief, outline: ArticleOutline, edit: EditResult, image_ref: Optional[dict], product_ref: Optional[dict] = None) -> dict:
+    """Build a review document mutation.
+
+    product_ref is the already-resolved reference for brief["target_product"]
+    (see publish_article, which looks it up alongside the image).
+    """
     doc_id = f"review-{outline['slug']}"
     if edit["confidence_score"] < PUBLISH_THRESHOLD:
         doc_id = f"drafts.{doc_id}"
 
-    pros, cons = _extract_pros_cons(edit["final_markdown"])
+    excerpt, pros, cons = _extract_review_fields(edit["final_markdown"])
 
     doc = {
         "_type": "review",
@@ -137,7 +183,7 @@ def _build_review_doc(brief: ResearchBrief, outline: ArticleOutline, edit: EditR
         "title": outline["title"],
         "slug": {"_type": "slug", "current": outline["slug"]},
         "publishedAt": datetime.now(timezone.utc).isoformat(),
-        "excerpt": _extract_excerpt(edit["final_markdown"]),
+        "excerpt": excerpt,
         "rating": 4.0,
         "generatedContent": edit["final_markdown"],
         "sourceModel": "gpt-4o",
@@ -151,11 +197,8 @@ def _build_review_doc(brief: ResearchBrief, outline: ArticleOutline, edit: EditR
         doc["mainImage"] = image_ref
 
     # Attach product reference
-    target_product = brief.get("target_product")
-    if target_product:
-        product_ref = _find_product_ref(target_product, dry_run=dry_run)
-        if product_ref:
-            doc["product"] = product_ref
+    if product_ref:
+        doc["product"] = product_ref
 
     return doc
 
@@ -167,7 +210,10 @@ def _build_usecase_doc(brief: ResearchBrief, outline: ArticleOutline, edit: Edit
         doc_id = f"drafts.{doc_id}"
 
     excerpt = _extract_excerpt(edit["final_markdown"])
-    # Split intro from body: first paragraph is the intro
+    # Split intro from body: first paragraph is the intro. It gets its own
+    # to_portable_text call rather than a slice of the content blocks — one
+    # paragraph converts in ~20µs, and slicing would need the converter to
+    # report which blocks came from it.
     lines = edit["final_markdown"].split("\n\n", 1)
     intro_md = lines[0] if lines else excerpt
 
@@ -248,34 +294,88 @@ _BUILDERS = {
 }
 
 
+def _brief_asin(brief: ResearchBrief) -> Optional[str]:
+    """ASIN of the brief's first relevant product, used for the Amazon image."""
+    if brief.get("relevant_products"):
+        return brief["relevant_products"][0].get("asin")
+    return None
+
+
+def prefetch_editorial_image(brief: ResearchBrief) -> Optional["Future[Optional[bytes]]"]:
+    """Start DALL-E generation for the brief's editorial image in the background.
+
+    The prompt only depends on topic and content type, so the image can be
+    generated while the article is validated and edited. Returns None for
+    briefs with an ASIN, which try Amazon first.
+    """
+    if _brief_asin(brief):
+        return None
+    return generate_editorial_images_bulk([(brief["topic"], brief["content_type"])])[0]
+
+
+def prefetch_product_refs(briefs: List[ResearchBrief], dry_run: bool = False) -> Optional[Dict[str, dict]]:
+    """Resolve every review's target product by exact name in one query.
+
+    Returns {lowercased name: reference} for publish_article, or None if
+    there was nothing to look up or the query failed (each article then
+    does its own lookup).
+    """
+    names = sorted({
+        brief["target_product"].lower()
+        for brief in briefs
+        if brief["content_type"] == "review" and brief.get("target_product")
+    })
+    if dry_run or not names:
+        return None
+    try:
+        results = query(PRODUCTS_BY_NAMES, {"names": names})
+    except Exception as e:
+        log.warning("Could not batch-look up %d products: %s", len(names), e)
+        return None
+    refs: Dict[str, dict] = {}
+    for product in results or []:
+        refs.setdefault(product["name"].lower(), {"_type": "reference", "_ref": product["_id"]})
+    log.info("Resolved %d/%d review products in one query", len(refs), len(names))
+    return refs
+
+
 def publish_article(
     brief: ResearchBrief,
     outline: ArticleOutline,
     edit: EditResult,
     dry_run: bool = False,
+    image_bytes: Optional[bytes] = None,
+    product_refs: Optional[Dict[str, dict]] = None,
 ) -> Dict:
     """Build the Sanity document mutation, acquire image, and push to Sanity.
 
+    image_bytes is a pre-generated editorial image (see prefetch_editorial_image),
+    product_refs the run's batch of product references (see prefetch_product_refs).
+
     Returns a summary dict with id, type, score, decision, and any errors.
     """
     content_type = brief["content_type"]
     builder = _BUILDERS.get(content_type, _build_usecase_doc)
 
     # Acquire image: use product ASIN for reviews, DALL-E for editorial
-    asin = None
-    if brief.get("relevant_products"):
-        asin = brief["relevant_products"][0].get("asin")
-
-    image_ref = acquire_image(
-        topic=brief["topic"],
-        content_type=content_type,
-        asin=asin,
-        dry_run=dry_run,
-    )
+    asin = _brief_asin(brief)
+
+    # The image (download/generate + upload) and the review's product lookup
+    # are independent network round-trips, so overlap them on two threads
+    target_product = brief.get("target_product") if content_type == "review" else None
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        product_future = pool.submit(_find_product_ref, target_product, dry_run, product_refs)
+        image_ref = acquire_image(
+            topic=brief["topic"],
+            content_type=content_type,
+            asin=asin,
+            dry_run=dry_run,
+            image_bytes=image_bytes,
+        )
+        product_ref = product_future.result()
 
-    # _build_review_doc accepts dry_run; others ignore it via **kwargs
     if content_type == "review":
-        doc = builder(brief, outline, edit, image_ref, dry_run=dry_run)
+        doc = builder(brief, outline, edit, image_ref, product_ref=product_ref)
     else:
         doc = builder(brief, outline, edit, image_ref)
     doc_id = doc["_id"]
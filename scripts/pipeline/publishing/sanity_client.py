@@ -4,6 +4,7 @@ import logging
 from typing import Any, Dict, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from scripts.pipeline.config import (
     SANITY_API_TOKEN,
@@ -20,6 +21,13 @@ _HEADERS = {
     "Authorization": f"Bearer {SANITY_API_TOKEN}",
 }
 
+# One keep-alive session for the whole run: a publish makes several calls to
+# the same host, and each would otherwise pay its own TCP + TLS handshake.
+# Pool size covers the publisher's worker threads with room to spare.
+_session = requests.Session()
+_session.headers.update(_HEADERS)
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 
 def query(groq: str, params: Optional[Dict[str, Any]] = None) -> Any:
     """Run a GROQ query and return the result (list or dict)."""
@@ -32,7 +40,7 @@ def query(groq: str, params: Optional[Dict[str, Any]] = None) -> Any:
             # Sanity expects parameter values to be JSON-encoded
             payload[f"${k}"] = _json.dumps(v)
 
-    resp = requests.get(url, headers=_HEADERS, params=payload, timeout=30)
+    resp = _session.get(url, params=payload, timeout=30)
     resp.raise_for_status()
     return resp.json().get("result", [])
 
@@ -44,7 +52,7 @@ def mutate(mutations: List[Dict], dry_run: bool = False) -> Dict:
         url += "?dryRun=true"
 
     body = {"mutations": mutations}
-    resp = requests.post(url, headers=_HEADERS, json=body, timeout=30)
+    resp = _session.post(url, json=body, timeout=30)
     resp.raise_for_status()
     result = resp.json()
     log.info("Sanity mutate: %d mutations, dry_run=%s", len(mutations), dry_run)
@@ -54,13 +62,9 @@ def mutate(mutations: List[Dict], dry_run: bool = False) -> Dict:
 def upload_image(image_bytes: bytes, filename: str = "image.jpg") -> Optional[str]:
     """Upload an image to the Sanity assets API and return the asset _id."""
     url = f"{_BASE}/assets/images/{SANITY_DATASET}"
-    headers = {
-        "Authorization": f"Bearer {SANITY_API_TOKEN}",
-        "Content-Type": "image/jpeg",
-    }
-    resp = requests.post(
+    resp = _session.post(
         url,
-        headers=headers,
+        headers={"Content-Type": "image/jpeg"},
         data=image_bytes,
         params={"filename": filename},
         timeout=60,
@@ -35,6 +35,17 @@ EXISTING_COMPARISON_SLUGS = """
 *[_type == "comparison"].slug.current
 """
 
+# Everything research_agent's gap detection needs, in one round-trip
+CONTENT_GAPS = f"""
+{{
+  "products_without_reviews": ({PRODUCTS_WITHOUT_REVIEWS}),
+  "content_counts": {CONTENT_COUNTS_BY_TYPE},
+  "existing_usecase_slugs": ({EXISTING_USECASE_SLUGS}),
+  "existing_review_slugs": ({EXISTING_REVIEW_SLUGS}),
+  "existing_comparison_slugs": ({EXISTING_COMPARISON_SLUGS})
+}}
+"""
+
 # All products with their basic info (for research agent)
 ALL_PRODUCTS = """
 *[_type == "product"]{
@@ -54,6 +65,13 @@ PRODUCT_BY_NAME = """
 }
 """
 
+# Find products by exact name for a batch of lowercased names
+PRODUCTS_BY_NAMES = """
+*[_type == "product" && lower(name) in $names]{
+  _id, name
+}
+"""
+
 # Find a product by partial name match (for fuzzy lookups)
 PRODUCT_BY_NAME_CONTAINS = """
 *[_type == "product" && lower(name) match lower($term)]{
@@ -12,10 +12,14 @@ from typing import List
 
 from scripts.pipeline.agents import research_agent, outline_agent, writer_agent, format_validator, editor_agent
 from scripts.pipeline.config import (
-    EDITOR_MODEL, MAX_ARTICLES_PER_RUN, OUTLINE_MODEL, PUBLISH_THRESHOLD,
+    EDITOR_MODEL, EDITOR_RACE_MODELS, MAX_ARTICLES_PER_RUN, OUTLINE_MODEL,
     RESEARCH_MODEL, WRITER_MODEL,
 )
-from scripts.pipeline.publishing.publisher import publish_article
+from scripts.pipeline.publishing.publisher import (
+    prefetch_editorial_image,
+    prefetch_product_refs,
+    publish_article,
+)
 from scripts.pipeline.utils.cost_tracker import CostTracker
 from scripts.pipeline.utils.logging_config import setup_logging
 
@@ -42,7 +46,7 @@ def run_pipeline(
     log.info("  Research: %s", RESEARCH_MODEL)
     log.info("  Outline:  %s", OUTLINE_MODEL)
     log.info("  Writer:   %s", WRITER_MODEL)
-    log.info("  Editor:   %s", EDITOR_MODEL)
+    log.info("  Editor:   %s", ", ".join(EDITOR_RACE_MODELS) + " (race)" if EDITOR_RACE_MODELS else EDITOR_MODEL)
     log.info("=" * 60)
 
     # ── Stage 1: Research ───────────────────────────────────────────────
@@ -60,6 +64,9 @@ def run_pipeline(
     briefs = briefs[:max_articles]
     log.info("Research agent suggested %d articles", len(briefs))
 
+    # One GROQ query for every review's product instead of one or two per article
+    product_refs = prefetch_product_refs(briefs, dry_run=dry_run)
+
     for i, brief in enumerate(briefs):
         article_start = time.time()
         log.info("")
@@ -67,6 +74,7 @@ def run_pipeline(
         log.info("ARTICLE %d/%d: %s", i + 1, len(briefs), brief["topic"])
         log.info("-" * 60)
 
+        image_future = None
         try:
             # ── Stage 2: Outline ────────────────────────────────────────
             log.info("  Stage 2 — Outline Agent")
@@ -78,6 +86,11 @@ def run_pipeline(
             article, writer_tokens = writer_agent.run(brief, outline, dry_run=dry_run)
             tracker.add_llm_usage(writer_tokens // 2, writer_tokens // 2)
 
+            # Editorial image only needs the brief — generate it in the background
+            # during validation and editing. Started here rather than up front so
+            # an article that fails outlining or writing never pays for one.
+            image_future = prefetch_editorial_image(brief)
+
             # ── Stage 3.5: Format Validation (no LLM) ─────────────────
             log.info("  Stage 3.5 — Format Validator")
             article, validation = format_validator.run(article, outline)
@@ -91,7 +104,11 @@ def run_pipeline(
 
             # ── Stage 5+6: Image + Publish ──────────────────────────────
             log.info("  Stage 5/6 — Image Acquisition + Publishing")
-            pub_result = publish_article(brief, outline, edit, dry_run=dry_run)
+            image_bytes = image_future.result() if image_future else None
+            pub_result = publish_article(
+                brief, outline, edit,
+                dry_run=dry_run, image_bytes=image_bytes, product_refs=product_refs,
+            )
 
             elapsed = time.time() - article_start
             pub_result["elapsed_seconds"] = round(elapsed, 1)
@@ -101,6 +118,8 @@ def run_pipeline(
 
         except Exception as e:
             log.error("  FAILED: %s", e, exc_info=True)
+            if image_future:
+                image_future.cancel()  # no-op once the request is in flight
             results.append({
                 "title": brief["topic"],
                 "type": brief["content_type"],
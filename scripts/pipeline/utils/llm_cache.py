@@ -0,0 +1,60 @@
+"""Content-addressed disk cache for call_llm responses."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from scripts.pipeline.config import LLM_CACHE_DIR
+
+log = logging.getLogger(__name__)
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    json_mode: bool,
+    temperature: float,
+    max_tokens: Optional[int],
+) -> str:
+    """Hash every input that can change the response."""
+    payload = json.dumps(
+        [provider, model, system_prompt, user_prompt, json_mode, temperature, max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return LLM_CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def get(key: str) -> Optional[Any]:
+    """Return the cached content for a key, or None on a miss."""
+    try:
+        with open(_path(key), encoding="utf-8") as f:
+            return json.load(f)["content"]
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        log.warning("Ignoring unreadable LLM cache entry %s: %s", key[:12], e)
+        return None
+
+
+def put(key: str, content: Any) -> None:
+    """Store content (str, or parsed dict in json_mode) atomically."""
+    path = _path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"content": content}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
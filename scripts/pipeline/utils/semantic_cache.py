@@ -0,0 +1,85 @@
+"""Embedding-similarity cache for call_llm: near-duplicate prompts reuse a completion.
+
+Entries are scoped by an exact hash of everything except the user prompt
+(provider, model, system prompt, json_mode, max_tokens), so only the user
+prompt is matched by cosine similarity. Vectors live in a small SQLite file
+next to the exact-match cache and are searched brute-force with numpy — a
+pipeline run produces hundreds of entries, not millions, so no ANN index.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from scripts.pipeline.config import LLM_CACHE_DIR, SEMANTIC_CACHE_EMBEDDING_MODEL
+
+log = logging.getLogger(__name__)
+
+_DB_PATH = LLM_CACHE_DIR / "semantic.sqlite"
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " scope TEXT NOT NULL, embedding BLOB NOT NULL, content TEXT NOT NULL)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS entries_scope ON entries (scope)")
+    return _conn
+
+
+def scope_key(
+    provider: str,
+    model: str,
+    system_prompt: str,
+    json_mode: bool,
+    max_tokens: Optional[int],
+) -> str:
+    """Hash the inputs that must match exactly for a similar prompt to count."""
+    payload = json.dumps([provider, model, system_prompt, json_mode, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def embed(text: str) -> np.ndarray:
+    """Unit-normalized embedding of a prompt (OpenAI, regardless of the completion provider)."""
+    from scripts.pipeline.agents.base_agent import _get_openai
+
+    resp = _get_openai().embeddings.create(model=SEMANTIC_CACHE_EMBEDDING_MODEL, input=text)
+    vec = np.asarray(resp.data[0].embedding, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def lookup(scope: str, vec: np.ndarray, threshold: float) -> Optional[Any]:
+    """Return the content of the most similar entry in scope, if it clears the threshold."""
+    with _lock:
+        rows = _db().execute("SELECT embedding, content FROM entries WHERE scope = ?", (scope,)).fetchall()
+    if not rows:
+        return None
+    matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+    sims = matrix @ vec
+    best = int(np.argmax(sims))
+    if sims[best] < threshold:
+        return None
+    log.debug("Semantic cache hit (similarity %.4f)", sims[best])
+    return json.loads(rows[best][1])
+
+
+def store(scope: str, vec: np.ndarray, content: Any) -> None:
+    """Record a completion (str, or parsed dict in json_mode) under its prompt embedding."""
+    with _lock:
+        conn = _db()
+        conn.execute(
+            "INSERT INTO entries (scope, embedding, content) VALUES (?, ?, ?)",
+            (scope, vec.astype(np.float32).tobytes(), json.dumps(content, ensure_ascii=False)),
+        )
+        conn.commit()
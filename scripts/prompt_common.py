@@ -0,0 +1,20 @@
+"""
+Prompt pieces shared by the content generation scripts.
+
+Each generator keeps its instructions in a module-level SYSTEM_PROMPT so the
+prefix sent to OpenAI is byte-identical across requests (automatic prompt
+caching only reuses an exact prefix). Boilerplate that every generator
+repeats lives here so the scripts can't drift apart.
+"""
+
+import hashlib
+
+MARKDOWN_FORMATTING = (
+    "FORMATTING: Use standard Markdown throughout: ## for sections, ### for subsections, "
+    "- for bullet lists, 1. for numbered lists, **bold** for emphasis."
+)
+
+
+def prompt_fingerprint(prompt: str) -> str:
+    """Short stable hash of a static prompt — logged at startup so a changed prefix is visible"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
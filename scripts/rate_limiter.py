@@ -0,0 +1,143 @@
+"""
+OpenAI rate limiting for the content generation scripts.
+
+Tracks a rolling 60s window of requests and tokens (RPM + TPM) so concurrent
+generators wait only when a budget is actually exhausted, instead of sleeping
+a fixed amount after every call. One tracker is shared by every script in the
+process (generate_all.py runs them side by side), so it is thread-safe.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import List, Mapping, Optional, Tuple
+
+# Completion length we budget for when reserving tokens before a call
+DEFAULT_COMPLETION_TOKENS = 1500
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_reset(value: Optional[str]) -> float:
+    """Parse OpenAI reset durations like '1s', '6m0s' or '250ms' into seconds"""
+    if not value:
+        return 0.0
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in _DURATION.findall(value))
+
+
+def estimate_tokens(prompt: str, completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Rough token estimate for a call: ~4 characters per prompt token plus the completion"""
+    return len(prompt) // 4 + completion_tokens
+
+
+class TokenBudgetTracker:
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        window: float = 60.0,
+    ):
+        """
+        Initialize the tracker
+
+        Args:
+            rpm: Requests per minute (default: OPENAI_RPM env var or 500)
+            tpm: Tokens per minute (default: OPENAI_TPM env var or 30000)
+            window: Rolling window length in seconds
+        """
+        self.rpm = rpm or int(os.getenv("OPENAI_RPM", "500"))
+        self.tpm = tpm or int(os.getenv("OPENAI_TPM", "30000"))
+        self.window = window
+        self._events = deque()  # [timestamp, tokens] per dispatched request
+        self._tokens_in_window = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """Drop requests that have aged out of the window (lock held)"""
+        while self._events and now - self._events[0][0] >= self.window:
+            self._tokens_in_window -= self._events.popleft()[1]
+
+    def _try_reserve(self, tokens: int) -> Tuple[Optional[List], float]:
+        """Reserve budget for one request, or return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return None, self._paused_until - now
+            self._prune(now)
+            # A single oversized request is let through on an empty window
+            # rather than waiting forever
+            fits_tokens = self._tokens_in_window + tokens <= self.tpm or not self._events
+            if len(self._events) < self.rpm and fits_tokens:
+                ticket = [now, tokens]
+                self._events.append(ticket)
+                self._tokens_in_window += tokens
+                return ticket, 0.0
+            # Wait until the oldest request leaves the window
+            return None, max(self.window - (now - self._events[0][0]), 0.05)
+
+    async def acquire(self, estimated_tokens: int) -> List:
+        """
+        Wait until both budgets have room, then reserve the estimated tokens
+
+        Returns:
+            Ticket to hand back to record_usage() once the call returns
+        """
+        while True:
+            ticket, wait = self._try_reserve(estimated_tokens)
+            if ticket is not None:
+                return ticket
+            await asyncio.sleep(wait)
+
+    def record_usage(
+        self,
+        ticket: List,
+        total_tokens: Optional[int],
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Replace a ticket's estimate with actual usage and apply rate limit headers"""
+        with self._lock:
+            if total_tokens is not None:
+                if any(event is ticket for event in self._events):
+                    self._tokens_in_window += total_tokens - ticket[1]
+                ticket[1] = total_tokens
+            if headers:
+                self._apply_headers(headers, ticket[1])
+
+    def pause(self, seconds: float) -> None:
+        """Hold all new requests for the given number of seconds (e.g. on Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _apply_headers(self, headers: Mapping[str, str], last_tokens: int) -> None:
+        """Tune limits from x-ratelimit-* response headers (lock held)"""
+        limit_requests = headers.get("x-ratelimit-limit-requests")
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        if limit_requests and limit_requests.isdigit():
+            self.rpm = int(limit_requests)
+        if limit_tokens and limit_tokens.isdigit():
+            self.tpm = int(limit_tokens)
+
+        wait = 0.0
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests == "0":
+            wait = max(wait, _parse_reset(headers.get("x-ratelimit-reset-requests")))
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens and remaining_tokens.isdigit() and int(remaining_tokens) < last_tokens:
+            wait = max(wait, _parse_reset(headers.get("x-ratelimit-reset-tokens")))
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                wait = max(wait, float(retry_after))
+            except ValueError:
+                pass
+        if wait:
+            self._paused_until = max(self._paused_until, time.monotonic() + wait)
+
+
+# Shared by every generator running in this process
+openai_limiter = TokenBudgetTracker()
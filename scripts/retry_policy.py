@@ -0,0 +1,158 @@
+"""
+Retry policy for OpenAI and Sanity calls in the content generation scripts.
+
+Transient failures (rate limits, timeouts, 5xx, dropped connections) are
+retried with exponential backoff + jitter instead of dropping the item and the
+OpenAI spend already incurred. A server-sent Retry-After always wins over the
+computed backoff.
+"""
+
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from urllib3.util.retry import Retry
+
+from rate_limiter import estimate_tokens, openai_limiter
+
+MAX_ATTEMPTS = 6
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+OPENAI_RETRYABLE = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    httpx.HTTPError,
+)
+SANITY_RETRYABLE = (requests.ConnectionError, requests.Timeout)
+
+_backoff = wait_exponential_jitter(initial=1, max=60)
+
+# Keep idle OpenAI connections for a minute (httpx default: 5s) so calls spaced
+# out by the rate limiter still reuse the same TLS session
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=60)
+# HTTP/2 multiplexes concurrent requests over one connection; needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def make_openai_client() -> openai.AsyncOpenAI:
+    """
+    AsyncOpenAI client for the generator scripts
+
+    SDK retries are off — create_chat_completion owns the retry policy — and
+    the connection pool is tuned for long-lived keep-alive (HTTP/2 when h2 is
+    installed).
+    """
+    return openai.AsyncOpenAI(
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(limits=OPENAI_HTTP_LIMITS, http2=HTTP2_AVAILABLE),
+    )
+
+
+def make_sanity_session(headers: Dict[str, str]) -> requests.Session:
+    """
+    Pooled keep-alive session for Sanity API calls (one TLS handshake, reused)
+
+    The adapter only retries failed connects — 429/5xx responses go through
+    sanity_post so the two retry layers don't multiply.
+
+    HTTP/1.1 is enough here: the generators batch mutations into transactions,
+    so only a few writes are ever in flight and each reuses a pooled
+    connection. There's nothing for HTTP/2 multiplexing to win back.
+    """
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(total=3, backoff_factor=0.5)),
+    )
+    return session
+
+
+class RetryableResponse(Exception):
+    """Raised for a 429/5xx Sanity response so it goes through the retry policy"""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def _retry_after(exc: Optional[BaseException]) -> float:
+    """Seconds requested by a Retry-After header on the failed response, if any"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("retry-after") or 0)
+    except ValueError:
+        return 0.0  # HTTP-date form — fall back to the computed backoff
+
+
+def _wait(retry_state) -> float:
+    return max(_backoff(retry_state), _retry_after(retry_state.outcome.exception()))
+
+
+def _return_last_response(retry_state):
+    """Out of attempts: hand back the last 429/5xx response so the caller reports it"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RetryableResponse):
+        return exc.response
+    raise exc
+
+
+@retry(
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=_wait,
+    retry=retry_if_exception_type(OPENAI_RETRYABLE),
+    reraise=True,
+)
+async def create_chat_completion(client: openai.AsyncOpenAI, **kwargs):
+    """
+    Rate-limited, retried client.chat.completions.create
+
+    Reserves budget on the shared limiter before every attempt and records the
+    actual usage and rate limit headers afterwards.
+
+    Returns:
+        The parsed ChatCompletion
+    """
+    prompt_text = "".join(m["content"] for m in kwargs["messages"])
+    ticket = await openai_limiter.acquire(estimate_tokens(prompt_text))
+    try:
+        raw = await client.chat.completions.with_raw_response.create(**kwargs)
+    except openai.RateLimitError as e:
+        # Hold every generator sharing the limiter, not just this coroutine
+        openai_limiter.pause(_retry_after(e))
+        raise
+    response = raw.parse()
+    openai_limiter.record_usage(ticket, response.usage.total_tokens if response.usage else None, raw.headers)
+    return response
+
+
+@retry(
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=_wait,
+    retry=retry_if_exception_type((RetryableResponse,) + SANITY_RETRYABLE),
+    retry_error_callback=_return_last_response,
+)
+def sanity_post(url: str, session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """
+    POST to the Sanity API, retrying rate limits, 5xx and connection errors
+
+    Args:
+        url: Sanity mutate/query endpoint
+        session: Pooled session to send through (default: a one-off requests.post)
+        **kwargs: Passed through to post() (json, headers, timeout, ...)
+
+    Returns:
+        The final response — still a 429/5xx one if every attempt failed
+    """
+    response = (session or requests).post(url, **kwargs)
+    if response.status_code in RETRY_STATUSES:
+        raise RetryableResponse(response)
+    return response
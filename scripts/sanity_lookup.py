@@ -0,0 +1,37 @@
+"""
+Sanity helpers shared by the content generation scripts.
+"""
+
+from datetime import datetime, timezone
+from typing import Set
+
+import requests
+
+from retry_policy import sanity_post
+
+# publishedAt for every document written in this run (generate_all runs every
+# generator in one process), so a batch sorts together in the CMS
+PUBLISHED_AT = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def fetch_existing_ids(session: requests.Session, query_url: str, doc_type: str) -> Set[str]:
+    """
+    Fetch every document _id of one type in a single GROQ query
+
+    Used at startup to skip items that are already published instead of paying
+    for their OpenAI generation again. On any failure an empty set is returned
+    so the run falls back to generating everything.
+    """
+    try:
+        response = sanity_post(
+            query_url,
+            session=session,
+            json={"query": "*[_type == $type]._id", "params": {"type": doc_type}},
+            timeout=30,
+        )
+        if response.status_code == 200:
+            return set(response.json().get("result") or [])
+        print(f"⚠️  Could not fetch existing {doc_type} IDs: {response.text[:200]}")
+    except Exception as e:
+        print(f"⚠️  Could not fetch existing {doc_type} IDs: {e}")
+    return set()